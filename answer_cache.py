@@ -0,0 +1,123 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s%]")
+
+
+# Function to normalize a question so trivially different phrasings share a cache entry
+def normalize_question(question):
+    """Lowercases a question and removes punctuation and repeated whitespace."""
+    question = PUNCTUATION_PATTERN.sub(" ", question.lower())
+    return " ".join(question.split())
+
+
+# Function to fingerprint the loaded credit policy text
+def policy_version(credit_policy_text):
+    """Returns a short hash that changes whenever the policy text changes."""
+    return hashlib.sha256(credit_policy_text.encode("utf-8")).hexdigest()[:16]
+
+
+# SQLite-backed answer cache shared by every Streamlit session
+class AnswerCache:
+    """Stores Gemini answers keyed by normalized question, mode and policy version.
+
+    Entries expire after ``ttl_seconds`` and the least recently used entries are
+    evicted once more than ``max_entries`` are stored. Entries written for an
+    older policy version are dropped as soon as a new version is seen.
+    """
+
+    def __init__(self, path="answer_cache.sqlite3", max_entries=1000, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.current_version = None
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                policy_version TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def make_key(question, mode, version, context=""):
+        """Builds the cache key for a question asked in a mode against a policy version.
+
+        ``context`` is the conversation context sent with the question, so a
+        follow-up only matches answers given after the same conversation.
+        """
+        raw = "\x1f".join([normalize_question(question), mode, version, context])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def use_policy_version(self, version):
+        """Drops entries from other policy versions when the policy text changes."""
+        with self.lock:
+            if version == self.current_version:
+                return
+            removed = self.connection.execute(
+                "DELETE FROM answers WHERE policy_version != ?", (version,)
+            ).rowcount
+            self.connection.commit()
+            self.current_version = version
+        if removed:
+            print(f"Answer cache: dropped {removed} entries from an older credit policy")
+
+    def get(self, question, mode, version, context=""):
+        """Returns the cached answer or None, updating the hit/miss counters."""
+        key = self.make_key(question, mode, version, context)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT answer, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self.connection.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self.connection.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, question, mode, version, answer, context=""):
+        """Stores an answer and evicts expired and least recently used entries."""
+        key = self.make_key(question, mode, version, context)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, version, mode, normalize_question(question), answer, now, now),
+            )
+            self.connection.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.connection.execute(
+                """
+                DELETE FROM answers WHERE key IN (
+                    SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self.connection.commit()
+
+    def stats(self):
+        """Returns the hit and miss counters and the number of stored entries."""
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
@@ -0,0 +1,78 @@
+from answer_cache import policy_version
+from conversation import is_follow_up
+from policy_retrieval import PolicyIndex, estimate_tokens
+
+# Extra instructions appended to the question for each Conversation Mode
+MODE_PROMPTS = {
+    "Concise": " Please provide a very brief and to-the-point answer.",
+    "Detailed": " Please provide a comprehensive and detailed explanation.",
+    "Standard": ""
+}
+
+NO_ANSWER = "Sorry, I couldn't generate a response."
+
+
+# Function to build the Gemini prompt from the retrieved policy sections
+def compose_prompt(question, context, mode="Standard", history=""):
+    """Returns the prompt sent to Gemini for a question and its retrieved policy context."""
+    history_prompt = f"Conversation so far:\n{history}\n\n" if history else ""
+    return (
+        "Use the following sections of the credit policy document to answer the question:"
+        f"\n\n{context}\n\n{history_prompt}Question: {question}{MODE_PROMPTS.get(mode, '')}"
+    )
+
+
+# Question answering over the credit policy without the Streamlit UI
+class PolicyAnswerer:
+    """Answers questions the way the chat app does: policy facts, answer cache, then Gemini.
+
+    ``generate_fn(prompt)`` returns a Gemini response (anything with
+    ``.text``), e.g. ``GeminiDispatcher.generate``. ``cache`` (an
+    ``AnswerCache``) and ``facts`` (a ``PolicyFacts``) are optional.
+    """
+
+    def __init__(self, credit_policy_text, generate_fn, cache=None, facts=None, top_k=6, token_budget=1200, embed_fn=None):
+        self.index = PolicyIndex.from_markdown(credit_policy_text, embed_fn=embed_fn)
+        self.version = policy_version(credit_policy_text)
+        self.generate_fn = generate_fn
+        self.cache = cache
+        self.facts = facts
+        self.top_k = top_k
+        self.token_budget = token_budget
+        if cache is not None:
+            cache.use_policy_version(self.version)
+
+    def answer(self, question, mode="Standard", history=""):
+        """Returns a dict with the ``answer``, its ``source``, ``prompt_tokens`` and the policy ``sections`` used."""
+        # Standalone questions are answered and cached without the conversation, as in the chat app
+        if not is_follow_up(question):
+            history = ""
+        # Follow-ups depend on earlier turns, which the policy tables cannot take into account
+        if self.facts is not None and not history:
+            fact = self.facts.answer(question)
+            if fact is not None:
+                return {"answer": fact["answer"], "source": "facts", "prompt_tokens": 0, "sections": []}
+        if self.cache is not None:
+            cached_answer = self.cache.get(question, mode, self.version, history)
+            if cached_answer is not None:
+                return {"answer": cached_answer, "source": "cache", "prompt_tokens": 0, "sections": []}
+
+        # Follow-up questions lean on the previous turns, so they also steer retrieval
+        retrieval = self.index.build_context(
+            f"{question}\n{history}" if history else question,
+            top_k=self.top_k,
+            token_budget=self.token_budget
+        )
+        prompt = compose_prompt(question, retrieval["context"], mode, history)
+        response = self.generate_fn(prompt)
+        answer = response.text if response else ""
+        if not answer:
+            answer = NO_ANSWER
+        elif self.cache is not None:
+            self.cache.put(question, mode, self.version, answer, history)
+        return {
+            "answer": answer,
+            "source": "gemini",
+            "prompt_tokens": estimate_tokens(prompt),
+            "sections": retrieval["sections"],
+        }
@@ -0,0 +1,93 @@
+import argparse
+import json
+import re
+
+import pandas as pd
+
+# The original augmentation: one synthetic question per row with these replacements applied in order
+DEFAULT_RULES = [
+    (re.escape("What"), "Tell me about"),
+    (re.escape("How"), "Explain"),
+    (re.escape("Can"), "Is it possible to"),
+]
+DEFAULT_RULE_SETS = [DEFAULT_RULES]
+
+
+# Function to load rewrite rules from a JSON file
+def load_rule_sets(path):
+    """Reads rule sets from JSON: a list of rule sets, each a list of ``[regex, replacement]`` pairs.
+
+    Every rule set produces one synthetic copy of each question.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [[(pattern, replacement) for pattern, replacement in rule_set] for rule_set in json.load(f)]
+
+
+# Function to compile the regular expressions of every rule set once
+def compile_rule_sets(rule_sets):
+    """Returns the rule sets with their patterns compiled."""
+    return [[(re.compile(pattern), replacement) for pattern, replacement in rule_set] for rule_set in rule_sets]
+
+
+# Function to add synthetic questions to a DataFrame with whole-column string operations
+def augment_frame(df, rule_sets=DEFAULT_RULE_SETS, dedupe=False):
+    """Returns the rows of ``df`` each followed by one synthetic row per rule set.
+
+    With ``dedupe`` a synthetic row is dropped when no rule changed its
+    question or another rule set already produced the same question.
+    """
+    compiled = compile_rule_sets(rule_sets)
+    copies = [df]
+    for rule_set in compiled:
+        questions = df["questions"]
+        for pattern, replacement in rule_set:
+            questions = questions.str.replace(pattern, replacement, regex=True)
+        synthetic = df.assign(questions=questions)
+        if dedupe:
+            keep = questions != df["questions"]
+            for earlier in copies[1:]:
+                keep &= ~(questions == earlier["questions"].reindex(df.index))
+            synthetic = synthetic[keep]
+        copies.append(synthetic)
+
+    # A stable sort on the shared index puts every original row right before its synthetic rows
+    return pd.concat(copies).sort_index(kind="stable").reset_index(drop=True)
+
+
+# Function to augment a CSV file chunk by chunk
+def augment_csv(path, chunksize=50_000, rule_sets=DEFAULT_RULE_SETS, dedupe=False):
+    """Yields augmented DataFrames for successive chunks of a CSV, so the file is never fully in memory."""
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield augment_frame(chunk, rule_sets=rule_sets, dedupe=dedupe)
+
+
+# Function to stream an augmented copy of a CSV to disk
+def write_augmented_csv(source_path, output_path, chunksize=50_000, rule_sets=DEFAULT_RULE_SETS, dedupe=False):
+    """Writes the augmented dataset to ``output_path`` and returns the number of rows written."""
+    rows = 0
+    for i, chunk in enumerate(augment_csv(source_path, chunksize, rule_sets, dedupe)):
+        chunk.to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        rows += len(chunk)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write an augmented copy of a FAQ CSV, streaming it chunk by chunk so it never has to fit in memory."
+    )
+    parser.add_argument("source", help="CSV with questions, answers and labels columns")
+    parser.add_argument("output", help="Where the augmented CSV is written")
+    parser.add_argument("--rules", help="JSON file with extra question rewrite rule sets")
+    parser.add_argument("--dedupe", action="store_true", help="Drop synthetic questions identical to an original")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows read from the source CSV per chunk")
+    args = parser.parse_args()
+
+    rule_sets = DEFAULT_RULE_SETS
+    if args.rules:
+        rule_sets = DEFAULT_RULE_SETS + load_rule_sets(args.rules)
+    rows = write_augmented_csv(args.source, args.output, args.chunksize, rule_sets, args.dedupe)
+    print(f"Wrote {rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
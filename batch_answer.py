@@ -0,0 +1,218 @@
+"""Answer a JSONL file of questions headlessly, through the same path as the chat app.
+
+Usage: python batch_answer.py questions.jsonl --output answers.jsonl --workers 4 --rate-limit 2
+Each input line is a JSON object with the question under --question-field and an optional id
+under --id-field. Results are appended to the output file as they finish; running again with
+the same output skips the questions already answered, so an interrupted run resumes.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+from answer_cache import AnswerCache
+from answering import MODE_PROMPTS, PolicyAnswerer
+from benchmarking import latency_summary, percentile
+from gemini_dispatcher import GeminiDispatcher
+from policy_facts import PolicyFacts
+
+
+# Spaces Gemini calls evenly across all worker threads
+class RateLimiter:
+    """Lets at most ``rate_per_second`` callers through per second (no limit when 0)."""
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        time.sleep(start - now)
+
+
+# Function to stream questions from a JSONL file
+def read_questions(path, question_field="question", id_field="id"):
+    """Yields ``(id, question)`` pairs; lines without an id are identified by their line number."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            question_id = record.get(id_field)
+            yield (f"line-{line_number}" if question_id is None else str(question_id)), record[question_field]
+
+
+# Function to find the questions an earlier run already answered
+def completed_ids(output_path):
+    """Returns the ids answered without error in an existing output file.
+
+    A line cut short by an interrupted run is ignored and a newline is added
+    so new results start on a fresh line.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, "rb+") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if "error" not in result:
+                done.add(result["id"])
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    return done
+
+
+def build_answerer(args):
+    cache_path = args.cache_path
+    if args.fake_gemini:
+        from fakes import FakeGenerativeModel
+        model = FakeGenerativeModel(first_token_latency=0.2, token_latency=0.002, seed=0)
+        # Fake answers must never reach the cache the chat app serves from
+        cache_path = os.path.join(tempfile.mkdtemp(prefix="batch_answer_"), "answer_cache.sqlite3")
+        print(f"Dry run: caching fake answers in {cache_path}")
+    else:
+        import google.generativeai as genai
+        genai.configure(api_key=os.environ["API_KEY"])
+        model = genai.GenerativeModel("gemini-pro")
+    dispatcher = GeminiDispatcher(model, max_concurrency=args.workers)
+    limiter = RateLimiter(args.rate_limit)
+
+    def generate(prompt):
+        limiter.wait()
+        return dispatcher.generate(prompt)
+
+    with open(args.policy, "r", encoding="utf-8") as f:
+        credit_policy_text = f.read()
+    return PolicyAnswerer(
+        credit_policy_text,
+        generate,
+        cache=None if args.no_cache else AnswerCache(cache_path),
+        facts=PolicyFacts.from_markdown(credit_policy_text) if args.facts else None,
+        top_k=int(os.getenv("RETRIEVAL_TOP_K", "6")),
+        token_budget=int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "1200"))
+    )
+
+
+def build_bert_server(model_dir, backend):
+    from transformers import BertTokenizer
+
+    from bert_inference import LabelIndex, MicroBatcher, load_classifier, predict_label_indices
+
+    tokenizer = BertTokenizer.from_pretrained(model_dir)
+    model = load_classifier(model_dir, backend=backend)
+    label_index = LabelIndex.load(model_dir)
+    label_index.check_model(model)
+    return MicroBatcher(
+        lambda questions: [label_index.answer(i) for i in predict_label_indices(questions, model, tokenizer)]
+    ).start()
+
+
+# Function to answer one question through every configured path
+def answer_one(question_id, question, answerer, mode, bert_server=None):
+    result = {"id": question_id, "question": question}
+    start = time.perf_counter()
+    try:
+        result.update(answerer.answer(question, mode))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    if bert_server is not None:
+        bert_start = time.perf_counter()
+        try:
+            result["bert_answer"] = bert_server.submit(question).result()
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["bert_seconds"] = round(time.perf_counter() - bert_start, 4)
+    return result
+
+
+def print_summary(results, skipped, wall_seconds):
+    latencies = sorted(result["seconds"] for result in results)
+    errors = sum("error" in result for result in results)
+    print(f"Answered {len(results) - errors} questions ({errors} errors, {skipped} already done) in {wall_seconds:.1f}s")
+    if not latencies:
+        return
+    print(f"Throughput: {len(results) / wall_seconds:.2f} questions/s")
+    print(f"Latency: mean {statistics.mean(latencies):.2f}s · p50 {percentile(latencies, 0.50):.2f}s · "
+          f"p95 {percentile(latencies, 0.95):.2f}s · p99 {percentile(latencies, 0.99):.2f}s")
+    sources = Counter(result.get("source", "error") for result in results)
+    print("Sources: " + ", ".join(f"{source} {count}" for source, count in sources.most_common()))
+    bert = [result["bert_seconds"] for result in results if "bert_seconds" in result]
+    if bert:
+        summary = latency_summary(bert)
+        print(f"BERT latency: p50 {summary['p50_ms']:.0f} ms · p95 {summary['p95_ms']:.0f} ms")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of questions")
+    parser.add_argument("--output", default="answers.jsonl")
+    parser.add_argument("--question-field", default="question")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--mode", choices=list(MODE_PROMPTS), default="Standard")
+    parser.add_argument("--policy", default="Credit_Policy2.md")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Maximum Gemini calls per second (0 = no limit)")
+    parser.add_argument("--facts", action="store_true", help="Answer simple lookups from the policy tables, as the chat app does")
+    parser.add_argument("--no-cache", action="store_true", help="Always call Gemini instead of using the answer cache")
+    parser.add_argument("--cache-path", default=os.getenv("ANSWER_CACHE_PATH", "answer_cache.sqlite3"))
+    parser.add_argument("--bert-model-dir", help="Also answer every question with the BERT classifier in this directory")
+    parser.add_argument("--bert-backend", default="torch")
+    parser.add_argument("--fake-gemini", action="store_true", help="Use the local fake model instead of Gemini (dry runs)")
+    args = parser.parse_args()
+
+    answerer = build_answerer(args)
+    bert_server = build_bert_server(args.bert_model_dir, args.bert_backend) if args.bert_model_dir else None
+    done = completed_ids(args.output)
+    results, skipped = [], 0
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(args.workers) as pool, open(args.output, "a", encoding="utf-8") as out:
+        def write(finished):
+            for future in finished:
+                result = future.result()
+                results.append(result)
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                if len(results) % 50 == 0:
+                    print(f"{len(results)} answered...")
+
+        # Only a few questions are queued at a time, so the input file is never loaded whole
+        pending = set()
+        for question_id, question in read_questions(args.input, args.question_field, args.id_field):
+            if question_id in done:
+                skipped += 1
+                continue
+            pending.add(pool.submit(answer_one, question_id, question, answerer, args.mode, bert_server))
+            if len(pending) >= 2 * args.workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(finished)
+        write(wait(pending).done)
+
+    if bert_server is not None:
+        bert_server.stop()
+    print_summary(results, skipped, time.perf_counter() - start)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Latency, memory and accuracy of the CPU inference backends on the validation split.
+
+Usage: python benchmark_backends.py --model-dir ./bert_chatbot_model
+Each backend runs in its own process so peak memory is measured in isolation.
+"""
+import argparse
+import json
+import time
+
+from transformers import BertTokenizer
+
+from benchmarking import latency_summary, peak_rss_mb, run_worker
+from bert_inference import BACKENDS, load_classifier, predict_label_indices
+from faq_dataset import load_splits
+
+
+# Function to measure one backend (runs in a child process)
+def measure(backend, model_dir, data_path, latency_samples):
+    _, _, val_df, _ = load_splits(data_path)
+    questions = list(val_df["questions"])
+    labels = list(val_df["label_encoded"])
+
+    tokenizer = BertTokenizer.from_pretrained(model_dir)
+    start = time.perf_counter()
+    model = load_classifier(model_dir, backend=backend)
+    load_time = time.perf_counter() - start
+
+    predict_label_indices(questions[:1], model, tokenizer)
+    latencies = []
+    for question in (questions * latency_samples)[:latency_samples]:
+        start = time.perf_counter()
+        predict_label_indices([question], model, tokenizer)
+        latencies.append(time.perf_counter() - start)
+
+    predictions = []
+    for i in range(0, len(questions), 32):
+        predictions.extend(predict_label_indices(questions[i:i + 32], model, tokenizer))
+    accuracy = sum(p == t for p, t in zip(predictions, labels)) / len(labels)
+
+    return {
+        "backend": backend,
+        "load_seconds": load_time,
+        **latency_summary(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+        "accuracy": accuracy,
+        "predictions": predictions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", default="./bert_chatbot_model")
+    parser.add_argument("--data", default="clean_data.csv")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--latency-samples", type=int, default=200)
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.model_dir, args.data, args.latency_samples)))
+        return
+
+    results = []
+    for backend in args.backends:
+        result = run_worker(__file__, backend, [
+            "--model-dir", args.model_dir, "--data", args.data, "--latency-samples", args.latency_samples
+        ])
+        if result is not None:
+            results.append(result)
+
+    baseline = next((result for result in results if result["backend"] == "torch"), None)
+    print(f"{'backend':<12}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'peak MB':>10}{'accuracy':>10}{'drop':>8}{'agree':>8}")
+    for result in results:
+        drop = agree = float("nan")
+        if baseline is not None:
+            drop = baseline["accuracy"] - result["accuracy"]
+            agree = sum(
+                a == b for a, b in zip(baseline["predictions"], result["predictions"])
+            ) / len(result["predictions"])
+        print(
+            f"{result['backend']:<12}{result['load_seconds']:>8.2f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+            f"{result['peak_rss_mb']:>10.0f}{result['accuracy']:>10.3f}{drop:>8.3f}{agree:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
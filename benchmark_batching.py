@@ -0,0 +1,92 @@
+"""Throughput/latency benchmark: per-call predict vs. the micro-batching inference server.
+
+Usage: python benchmark_batching.py --model-dir ./bert_chatbot_model --concurrency 16
+"""
+import argparse
+import threading
+import time
+
+import pandas as pd
+import torch
+from transformers import BertForSequenceClassification, BertTokenizer
+
+from benchmarking import latency_summary
+from bert_inference import MAX_LENGTH, MicroBatcher, predict_label_indices
+
+
+# Function to reproduce the original per-call predict (batch size 1, gradients tracked)
+def legacy_predict_index(question, model, tokenizer):
+    inputs = tokenizer(question, truncation=True, padding=True, max_length=MAX_LENGTH, return_tensors="pt")
+    inputs = {key: val.to(model.device) for key, val in inputs.items()}
+    outputs = model(**inputs)
+    return torch.argmax(outputs.logits, dim=1).item()
+
+
+# Function to fire questions from several threads and time each request
+def run_load(questions, concurrency, ask):
+    latencies = []
+    lock = threading.Lock()
+    chunks = [questions[i::concurrency] for i in range(concurrency)]
+
+    def worker(chunk):
+        for question in chunk:
+            start = time.perf_counter()
+            ask(question)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def report(name, wall_time, latencies):
+    summary = latency_summary(latencies)
+    print(
+        f"{name:<22} throughput {len(latencies) / wall_time:8.1f} q/s   "
+        f"p50 {summary['p50_ms']:7.1f} ms   p95 {summary['p95_ms']:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", default="./bert_chatbot_model")
+    parser.add_argument("--data", default="clean_data.csv")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    tokenizer = BertTokenizer.from_pretrained(args.model_dir)
+    model = BertForSequenceClassification.from_pretrained(args.model_dir)
+    model.eval()
+
+    pool = list(pd.read_csv(args.data)["questions"])
+    questions = [pool[i % len(pool)] for i in range(args.requests)]
+
+    # Warm up both paths so one-off allocation costs are not measured
+    legacy_predict_index(questions[0], model, tokenizer)
+    predict_label_indices(questions[:args.max_batch_size], model, tokenizer)
+
+    wall_time, latencies = run_load(questions, args.concurrency, lambda q: legacy_predict_index(q, model, tokenizer))
+    report("per-call predict", wall_time, latencies)
+
+    batcher = MicroBatcher(
+        lambda batch: predict_label_indices(batch, model, tokenizer),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+    ).start()
+    wall_time, latencies = run_load(questions, args.concurrency, lambda q: batcher.submit(q).result())
+    batcher.stop()
+    report("micro-batched", wall_time, latencies)
+    print(f"average batch size: {batcher.average_batch_size():.1f}")
+
+
+if __name__ == "__main__":
+    main()
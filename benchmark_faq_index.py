@@ -0,0 +1,133 @@
+"""Latency and accuracy of the nearest-neighbour FAQ index against the BERT classifier on the validation split.
+
+Usage: python benchmark_faq_index.py --model-dir ./bert_chatbot_model --encoder sentence-transformers/all-MiniLM-L6-v2
+The index is built from the training split only. Validation questions are original questions held out
+before augmentation (see faq_dataset.load_splits), so neither engine has seen them or any rewrite of them.
+Compare against a classifier trained with the same split, or its accuracy is inflated.
+Each engine runs in its own process so peak memory is measured in isolation.
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+from benchmarking import latency_summary, peak_rss_mb, run_worker
+from faq_dataset import load_splits
+from faq_index import DEFAULT_ENCODER
+
+ENGINES = ("classifier", "faq-index")
+
+
+# Function to time single-question calls of an engine
+def time_questions(answer_fn, questions, samples):
+    answer_fn(questions[0])
+    latencies = []
+    for question in (questions * samples)[:samples]:
+        start = time.perf_counter()
+        answer_fn(question)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# Function to measure one engine (runs in a child process)
+def measure(engine, args):
+    _, train_df, val_df, label_encoder = load_splits(args.data)
+    questions = list(val_df["questions"])
+    labels = [str(label) for label in val_df["labels"]]
+    result = {"engine": engine}
+
+    if engine == "classifier":
+        from transformers import BertTokenizer
+
+        from bert_inference import LabelIndex, load_classifier, predict, predict_label_indices
+
+        start = time.perf_counter()
+        tokenizer = BertTokenizer.from_pretrained(args.model_dir)
+        model = load_classifier(args.model_dir, backend=args.backend)
+        label_index = LabelIndex.load(args.model_dir)
+        result["load_seconds"] = time.perf_counter() - start
+        latencies = time_questions(lambda q: predict(q, model, tokenizer, label_index), questions, args.latency_samples)
+        indices = []
+        for i in range(0, len(questions), 32):
+            indices.extend(predict_label_indices(questions[i:i + 32], model, tokenizer))
+        predictions = [str(label) for label in label_encoder.classes_[indices]]
+    else:
+        from faq_index import FaqIndex, SentenceEncoder
+
+        start = time.perf_counter()
+        encoder = SentenceEncoder(args.encoder)
+        result["load_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        index = FaqIndex.build(tempfile.mkdtemp(prefix="faq_index_"), train_df["questions"], train_df["answers"],
+                               train_df["labels"], encoder, args.encoder)
+        result["build_seconds"] = time.perf_counter() - start
+        latencies = time_questions(lambda q: index.answer(q, k=args.k), questions, args.latency_samples)
+
+        # Search alone, with the questions already embedded
+        vectors = encoder(questions[:args.latency_samples])
+        search = []
+        for vector in vectors:
+            start = time.perf_counter()
+            index.search_vectors(vector[None, :], args.k)
+            search.append(time.perf_counter() - start)
+        result["search_p50_ms"] = statistics.median(search) * 1000
+
+        predictions = []
+        for i in range(0, len(questions), 256):
+            predictions.extend(index.predict_labels(questions[i:i + 256], k=args.k))
+
+        # New FAQ rows become searchable without retraining
+        start = time.perf_counter()
+        index.add(val_df["questions"][:100], val_df["answers"][:100], val_df["labels"][:100])
+        result["add_ms_per_row"] = (time.perf_counter() - start) * 1000 / 100
+
+    result.update({
+        **latency_summary(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+        "accuracy": sum(p == t for p, t in zip(predictions, labels)) / len(labels),
+        "predictions": predictions,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", default="./bert_chatbot_model")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--encoder", default=DEFAULT_ENCODER, help="Encoder for the FAQ index (e.g. the --model-dir itself)")
+    parser.add_argument("--data", default="clean_data.csv")
+    parser.add_argument("-k", type=int, default=1, help="Neighbours that vote on the FAQ index label")
+    parser.add_argument("--latency-samples", type=int, default=200)
+    parser.add_argument("--worker", choices=ENGINES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args)))
+        return
+
+    results = []
+    for engine in ENGINES:
+        result = run_worker(__file__, engine, [
+            "--model-dir", args.model_dir, "--backend", args.backend, "--encoder", args.encoder,
+            "--data", args.data, "-k", args.k, "--latency-samples", args.latency_samples
+        ])
+        if result is not None:
+            results.append(result)
+
+    print(f"{'engine':<12}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'peak MB':>10}{'accuracy':>10}")
+    for result in results:
+        print(
+            f"{result['engine']:<12}{result['load_seconds']:>8.2f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+            f"{result['peak_rss_mb']:>10.0f}{result['accuracy']:>10.3f}"
+        )
+    if len(results) == 2:
+        agree = sum(a == b for a, b in zip(results[0]["predictions"], results[1]["predictions"])) / len(results[0]["predictions"])
+        index = results[1]
+        print(f"Engines agree on {agree:.1%} of questions")
+        print(f"FAQ index: built in {index['build_seconds']:.1f}s, search alone p50 {index['search_p50_ms']:.2f} ms, "
+              f"adding a row costs {index['add_ms_per_row']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
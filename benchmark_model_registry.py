@@ -0,0 +1,76 @@
+"""Startup and per-interaction model overhead of test.py: loading on every rerun vs. the shared registry.
+
+Usage: python benchmark_model_registry.py --model-dir ./bert_chatbot_model --reruns 20
+Each variant runs in its own process so peak memory is measured in isolation.
+"""
+import argparse
+import json
+import time
+
+from benchmarking import latency_summary, peak_rss_mb, run_worker
+
+VARIANTS = ("per-rerun", "registry")
+
+
+# Function to time what one Streamlit rerun spends getting the model (runs in a child process)
+def measure(variant, model_dir, backend, reruns):
+    if variant == "per-rerun":
+        from transformers import BertTokenizer
+
+        from bert_inference import LabelIndex, load_classifier
+
+        # The old test.py loaded everything at module level, i.e. on every rerun
+        def rerun():
+            BertTokenizer.from_pretrained(model_dir)
+            model = load_classifier(model_dir, backend=backend)
+            LabelIndex.load(model_dir).check_model(model)
+    else:
+        from model_registry import ModelRegistry
+
+        # check_interval=0 makes every rerun pay for the change check, the worst case
+        registry = ModelRegistry(model_dir, backend=backend, check_interval=0)
+        rerun = registry.get
+
+    start = time.perf_counter()
+    rerun()
+    startup = time.perf_counter() - start
+    overheads = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        rerun()
+        overheads.append(time.perf_counter() - start)
+    return {
+        "variant": variant,
+        "startup_seconds": startup,
+        **latency_summary(overheads),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", default="./bert_chatbot_model")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--worker", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.model_dir, args.backend, args.reruns)))
+        return
+
+    print(f"{'variant':<12}{'startup s':>11}{'rerun p50 ms':>14}{'rerun p95 ms':>14}{'peak MB':>10}")
+    for variant in VARIANTS:
+        result = run_worker(__file__, variant, [
+            "--model-dir", args.model_dir, "--backend", args.backend, "--reruns", args.reruns
+        ])
+        if result is None:
+            continue
+        print(
+            f"{result['variant']:<12}{result['startup_seconds']:>11.2f}{result['p50_ms']:>14.2f}"
+            f"{result['p95_ms']:>14.2f}{result['peak_rss_mb']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Offline benchmark of the chatbot's hot paths with local stand-ins for Gemini and Google Sheets.
+
+Usage: python benchmark_offline.py --output benchmark_results.json [--compare old_results.json]
+Run it from the repository root. The real streamlitui.py code runs inside Streamlit's
+AppTest runner; only genai.GenerativeModel and the gspread client are replaced by the
+fakes in fakes.py, so no request leaves the machine.
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from unittest import mock
+
+from benchmarking import peak_rss_mb, percentile
+from chat_history import ChatHistory
+from fakes import FakeGenerativeModel, FakeSheetsClient, FakeWorksheet
+from login_mirror import COLUMNS as LOGIN_COLUMNS
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlitui.py")
+OFFLINE_SECRETS = {"API_KEY": "offline-benchmark", "gcp_service_account": {}}
+
+SAMPLE_QUESTIONS = [
+    "What is the interest rate for a gold loan?",
+    "What documents are required for a business loan?",
+    "What is the maximum age of the borrower?",
+    "How is the processing fee calculated?",
+    "Can a co-applicant be added after disbursement?",
+    "Explain the collateral requirements for secured loans.",
+    "What happens if an EMI payment bounces?",
+    "Who approves loans above the branch limit?",
+]
+
+# Scenarios that call streamlitui functions directly, in the order they run
+COMPONENT_SCENARIOS = [
+    "load_credit_policy",
+    "build_prompt",
+    "ask_gemini",
+    "ask_gemini_cached",
+    "save_login_record",
+    "load_login_records_cold",
+    "load_login_records_warm",
+]
+
+
+# Streamlit script that times one component scenario (runs inside AppTest, so it imports its own dependencies)
+def component_script():
+    import time
+
+    import streamlit as st
+
+    import streamlitui
+
+    config = st.session_state.bench_config
+    scenario = config["scenario"]
+    questions = config["questions"]
+    policy_text = streamlitui.load_credit_policy(config["policy_path"])
+
+    def call(i):
+        question = f"{questions[i % len(questions)]} (#{i})"
+        if scenario == "load_credit_policy":
+            streamlitui.load_credit_policy(config["policy_path"])
+        elif scenario == "build_prompt":
+            streamlitui.build_prompt(question, policy_text)
+        elif scenario == "ask_gemini":
+            streamlitui.ask_gemini(question, policy_text)
+        elif scenario == "ask_gemini_cached":
+            streamlitui.ask_gemini(questions[0], policy_text)
+        elif scenario == "save_login_record":
+            streamlitui.save_login_record(f"Employee {i}", f"E{i:05d}")
+        elif scenario == "load_login_records_cold":
+            streamlitui.get_login_mirror().reset()
+            streamlitui.load_login_records()
+        elif scenario == "load_login_records_warm":
+            streamlitui.load_login_records()
+
+    if scenario == "ask_gemini_cached":
+        call(0)
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for i in range(config["iterations"]):
+        call_start = time.perf_counter()
+        try:
+            call(i)
+        except Exception as e:
+            errors += 1
+            print(f"{scenario} failed: {e}")
+        latencies.append(time.perf_counter() - call_start)
+    result = {"latencies": latencies, "wall_seconds": time.perf_counter() - start, "errors": errors}
+
+    # Logins are only queued above; also time how long the writer takes to land them in the sheet
+    if scenario == "save_login_record":
+        worksheet = config["worksheet"]
+        expected = config["sheet_rows"] + config["iterations"]
+        while len(worksheet.rows) < expected and time.perf_counter() - start < 60:
+            time.sleep(0.01)
+        result["drain_seconds"] = time.perf_counter() - start
+    st.session_state.bench_result = result
+
+
+# Function to replace Gemini and Google Sheets with the fakes for everything run inside the block
+@contextmanager
+def offline_backends(model, worksheet):
+    import google.generativeai as genai
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(genai, "configure", lambda **kwargs: None))
+        stack.enter_context(mock.patch.object(genai, "GenerativeModel", lambda model_name, **kwargs: model))
+        stack.enter_context(mock.patch.object(gspread, "authorize", lambda credentials: FakeSheetsClient(worksheet)))
+        stack.enter_context(mock.patch.object(Credentials, "from_service_account_info", lambda info, scopes=None: None))
+        yield
+
+
+# Function to point every file the app writes at a scratch directory (read when streamlitui is imported)
+def use_scratch_files(directory):
+    for name, filename in [
+        ("ANSWER_CACHE_PATH", "answer_cache.sqlite3"),
+        ("RETRIEVAL_AUDIT_LOG", "retrieval_audit.jsonl"),
+        ("LOGIN_AUDIT_SPILL_PATH", "login_spill.jsonl"),
+        ("LOGIN_MIRROR_PATH", "login_mirror.sqlite3"),
+        ("HYBRID_ROUTER_LOG", "router_log.jsonl"),
+        ("METRICS_PATH", "metrics.jsonl"),
+    ]:
+        os.environ[name] = os.path.join(directory, filename)
+
+
+# Function to turn raw timings into the reported statistics
+def summarize(latencies, wall_seconds, errors=0, **extra):
+    latencies = sorted(latencies)
+    return {
+        "iterations": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput_per_s": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        **extra,
+    }
+
+
+# Function to run one component scenario through AppTest
+def run_component(scenario, args, worksheet):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_function(component_script, default_timeout=600)
+    app.secrets.update(OFFLINE_SECRETS)
+    app.session_state["bench_config"] = {
+        "scenario": scenario,
+        "iterations": args.iterations,
+        "questions": SAMPLE_QUESTIONS,
+        "policy_path": args.policy,
+        "worksheet": worksheet,
+        "sheet_rows": len(worksheet.rows),
+    }
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"{scenario}: {app.exception[0].message}")
+    result = app.session_state["bench_result"]
+    extra = {"drain_seconds": result["drain_seconds"]} if "drain_seconds" in result else {}
+    return summarize(result["latencies"], result["wall_seconds"], result["errors"], **extra)
+
+
+# Function to fill a chat history the way the app stores it
+def chat_history_from(messages):
+    history = ChatHistory(os.path.join(tempfile.mkdtemp(prefix="chatbot_bench_chat_"), "chat.jsonl"),
+                          window=int(os.getenv("CHAT_WINDOW_MESSAGES", "40")))
+    for message in messages:
+        history.append(message)
+    return history
+
+
+# Function to time full reruns of the chat page, with and without a new question
+def run_chat_loop(args):
+    from streamlit.testing.v1 import AppTest
+
+    history = []
+    for i in range(args.history_turns):
+        history.append({"role": "user", "content": SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]})
+        history.append({"role": "assistant", "content": " ".join(FakeGenerativeModel.ANSWER_WORDS * 4), "source": "gemini"})
+
+    app = AppTest.from_file(APP_PATH, default_timeout=600)
+    app.secrets.update(OFFLINE_SECRETS)
+    app.session_state["logged_in"] = True
+    app.session_state["user_name"] = "Benchmark"
+    app.session_state["user_emp_id"] = "B00001"
+    app.session_state["messages"] = chat_history_from(history)
+    app.run()
+
+    results = {}
+    latencies, start = [], time.perf_counter()
+    for _ in range(args.iterations):
+        run_start = time.perf_counter()
+        app.run()
+        latencies.append(time.perf_counter() - run_start)
+    results["chat_render"] = summarize(latencies, time.perf_counter() - start, messages=len(history))
+
+    latencies, errors, start = [], 0, time.perf_counter()
+    for i in range(args.iterations):
+        app.session_state["messages"] = chat_history_from(history)
+        if "conversation_memory" in app.session_state:
+            del app.session_state["conversation_memory"]
+        run_start = time.perf_counter()
+        app.chat_input[0].set_value(f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} (turn {i})").run()
+        latencies.append(time.perf_counter() - run_start)
+        errors += bool(app.exception)
+    results["chat_turn"] = summarize(latencies, time.perf_counter() - start, errors)
+    return results
+
+
+# Function to time the BERT predict path (skipped without a trained model)
+def run_bert_predict(args):
+    from transformers import BertTokenizer
+
+    from bert_inference import LabelIndex, load_classifier, predict
+
+    tokenizer = BertTokenizer.from_pretrained(args.model_dir)
+    model = load_classifier(args.model_dir, backend=args.backend)
+    label_index = LabelIndex.load(args.model_dir)
+    predict(SAMPLE_QUESTIONS[0], model, tokenizer, label_index)
+
+    latencies, start = [], time.perf_counter()
+    for i in range(args.iterations):
+        run_start = time.perf_counter()
+        predict(SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)], model, tokenizer, label_index)
+        latencies.append(time.perf_counter() - run_start)
+    return summarize(latencies, time.perf_counter() - start, backend=args.backend)
+
+
+# Function to record which commit the results belong to
+def current_commit():
+    try:
+        completed = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        return completed.stdout.strip() or None
+    except OSError:
+        return None
+
+
+# Function to print the results, side by side with an earlier run when given
+def print_report(results, baseline=None):
+    print(f"{'scenario':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'peak MB':>9}{'errors':>8}"
+          + (f"{'p95 vs base':>13}" if baseline else ""))
+    for name, result in results["scenarios"].items():
+        line = (f"{name:<26}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['throughput_per_s']:>10.1f}{result['peak_rss_mb']:>9.0f}{result['errors']:>8}")
+        old = (baseline or {}).get("scenarios", {}).get(name)
+        if old and old["p95_ms"]:
+            line += f"{result['p95_ms'] / old['p95_ms']:>12.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--policy", default="Credit_Policy2.md")
+    parser.add_argument("--history-turns", type=int, default=20, help="Chat turns already on the page for the render benchmark")
+    parser.add_argument("--sheet-rows", type=int, default=5000, help="Login records already in the fake sheet")
+    parser.add_argument("--first-token-latency", type=float, default=0.3, help="Fake Gemini delay before the first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="Fake Gemini delay per output token (s)")
+    parser.add_argument("--output-tokens", type=int, default=150)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--sheets-latency", type=float, default=0.2, help="Fake Sheets delay per call (s)")
+    parser.add_argument("--sheets-error-rate", type=float, default=0.0)
+    parser.add_argument("--model-dir", default="./bert_chatbot_model", help="Trained classifier for the predict benchmark")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare p95 latency against")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    use_scratch_files(tempfile.mkdtemp(prefix="chatbot_bench_"))
+    model = FakeGenerativeModel(
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency,
+        output_tokens=args.output_tokens,
+        error_rate=args.gemini_error_rate,
+        seed=args.seed,
+    )
+    rows = [list(LOGIN_COLUMNS)] + [
+        [f"Employee {i % 300}", f"E{i % 300:05d}", f"2024-01-{i % 28 + 1:02d} 09:{i % 60:02d}:00"]
+        for i in range(args.sheet_rows)
+    ]
+    worksheet = FakeWorksheet(rows, latency=args.sheets_latency, error_rate=args.sheets_error_rate, seed=args.seed)
+
+    scenarios = {}
+    with offline_backends(model, worksheet):
+        for scenario in COMPONENT_SCENARIOS:
+            print(f"Running {scenario}...")
+            scenarios[scenario] = run_component(scenario, args, worksheet)
+        print("Running chat page...")
+        scenarios.update(run_chat_loop(args))
+    if os.path.isdir(args.model_dir):
+        print("Running BERT predict...")
+        scenarios["bert_predict"] = run_bert_predict(args)
+    else:
+        print(f"Skipping BERT predict: {args.model_dir} not found")
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    results = {
+        "commit": current_commit(),
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "config": config,
+        "gemini": {"calls": model.calls, "prompt_tokens": model.prompt_tokens},
+        "scenarios": scenarios,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Cold start of streamlitui.py in each STARTUP_MODE: time to the first painted page and to the first answer.
+
+Usage: python benchmark_startup.py --think-seconds 2 [--runs 3]
+Every measurement runs in a fresh process, so nothing is already imported or cached. Gemini and
+Google Sheets are replaced by the fakes in fakes.py (see benchmark_offline.py), so it runs offline.
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarking import peak_rss_mb, run_worker
+
+MODES = ("eager", "lazy", "prewarm")
+
+
+# Function to time one cold start of the app (runs in a child process)
+def measure(mode, think_seconds):
+    import os
+
+    os.environ["STARTUP_MODE"] = mode
+    scratch = tempfile.mkdtemp(prefix="chatbot_startup_")
+    os.environ["CHAT_ARCHIVE_DIR"] = scratch
+
+    # Streamlit itself is loaded by the server before any script runs, so it is not counted
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    streamlit_seconds = time.perf_counter() - start
+
+    from benchmark_offline import APP_PATH, OFFLINE_SECRETS, offline_backends, use_scratch_files
+    from fakes import FakeGenerativeModel, FakeWorksheet
+    from login_mirror import COLUMNS as LOGIN_COLUMNS
+    use_scratch_files(scratch)
+
+    app = AppTest.from_file(APP_PATH, default_timeout=600)
+    app.secrets.update(OFFLINE_SECRETS)
+    start = time.perf_counter()
+    app.run()
+    first_paint = time.perf_counter() - start
+    genai_after_paint = "google.generativeai" in sys.modules
+
+    start = time.perf_counter()
+    app.run()
+    warm_rerun = time.perf_counter() - start
+
+    # The time a user spends typing their name and first question
+    time.sleep(think_seconds)
+
+    # Installing the fakes imports the SDKs, so that import is timed on its own: it is what is
+    # still left to load when the first question arrives (all of it when lazy, none when eager,
+    # whatever the background thread has not finished when prewarming)
+    model = FakeGenerativeModel(first_token_latency=0.0, token_latency=0.0, output_tokens=30)
+    start = time.perf_counter()
+    with offline_backends(model, FakeWorksheet([list(LOGIN_COLUMNS)])):
+        sdk_import = time.perf_counter() - start
+
+        start = time.perf_counter()
+        app.text_input(key="login_name").input("Benchmark")
+        app.text_input(key="login_emp_id").input("B00001")
+        app.button(key="login_button").click().run()
+        # Open-ended, so neither the policy tables nor the answer cache can answer it
+        app.chat_input[0].set_value("Explain the co-applicant rules for a loan against property.").run()
+        first_answer = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    if app.session_state["last_answer_source"] != "gemini" or not model.calls:
+        raise RuntimeError(f"The first question was answered by {app.session_state['last_answer_source']}, not Gemini")
+
+    return {
+        "mode": mode,
+        "streamlit_import_seconds": streamlit_seconds,
+        "first_paint_seconds": first_paint,
+        "warm_rerun_seconds": warm_rerun,
+        "sdk_import_seconds": sdk_import,
+        "first_answer_seconds": first_answer,
+        "genai_loaded_at_paint": genai_after_paint,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--think-seconds", type=float, default=2.0, help="Pause between the first page and the first question")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per mode (the median is reported)")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.think_seconds)))
+        return
+
+    # "first answer" is the app's own work for the first Gemini answer; "SDK left" is the import it still waits for
+    print(f"{'mode':<9}{'first paint s':>15}{'warm rerun ms':>15}{'SDK left s':>12}{'first answer s':>16}"
+          f"{'SDK at paint':>14}{'peak MB':>10}")
+    for mode in MODES:
+        results = []
+        for _ in range(args.runs):
+            result = run_worker(__file__, mode, ["--think-seconds", args.think_seconds])
+            if result is None:
+                break
+            results.append(result)
+        if not results:
+            continue
+        median = lambda key: statistics.median(result[key] for result in results)
+        print(
+            f"{mode:<9}{median('first_paint_seconds'):>15.2f}{median('warm_rerun_seconds') * 1000:>15.1f}"
+            f"{median('sdk_import_seconds'):>12.2f}{median('first_answer_seconds'):>16.2f}"
+            f"{str(results[0]['genai_loaded_at_paint']):>14}"
+            f"{median('peak_rss_mb'):>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
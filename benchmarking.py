@@ -0,0 +1,50 @@
+"""Helpers shared by the benchmark scripts: isolated worker processes, latency percentiles and peak memory.
+
+Kept free of heavy imports so the peak memory a worker reports is its own.
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+
+# Function to read the peak resident memory of this process
+def peak_rss_mb():
+    """Returns the peak RSS in MB, or NaN where the resource module is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Function to read a percentile from sorted values
+def percentile(sorted_values, q):
+    """Returns the value below which a fraction ``q`` of the sorted values fall (nearest rank)."""
+    return sorted_values[int(q * (len(sorted_values) - 1))]
+
+
+# Function to turn per-call timings in seconds into the reported latency figures
+def latency_summary(latencies):
+    """Returns ``p50_ms`` and ``p95_ms`` for a list of latencies in seconds."""
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+    }
+
+
+# Function to run one measurement in a fresh process so its memory and imports are isolated
+def run_worker(script, worker, args=()):
+    """Runs ``script --worker <worker> *args`` and returns the JSON it prints last, or None if it failed."""
+    completed = subprocess.run(
+        [sys.executable, script, "--worker", worker, *[str(arg) for arg in args]],
+        capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines() or [f"exit code {completed.returncode}"]
+        print(f"{worker}: failed\n{error[-1]}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
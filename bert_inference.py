@@ -0,0 +1,304 @@
+import argparse
+import copy
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import torch
+from transformers import AutoConfig, BertForSequenceClassification
+
+MAX_LENGTH = 128
+LABEL_INDEX_FILE = "label_index.json"
+
+# CPU inference backends and the files the export step writes for them
+BACKENDS = ("torch", "torch-int8", "onnx")
+EXPORT_FORMATS = ("int8", "onnx")
+INT8_MODEL_FILE = "model_int8.pt"
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+
+# Function to classify a batch of questions in one forward pass
+def predict_label_indices(questions, model, tokenizer):
+    """Returns the predicted class index for each question, without tracking gradients."""
+    inputs = tokenizer(list(questions), truncation=True, padding=True, max_length=MAX_LENGTH, return_tensors="pt")
+    inputs = {key: val.to(model.device) for key, val in inputs.items()}
+    with torch.inference_mode():
+        outputs = model(**inputs)
+    return torch.argmax(outputs.logits, dim=1).tolist()
+
+
+# Function to get class probabilities for a batch of questions
+def predict_probabilities(questions, model, tokenizer):
+    """Returns a (questions x classes) tensor of softmax probabilities."""
+    inputs = tokenizer(list(questions), truncation=True, padding=True, max_length=MAX_LENGTH, return_tensors="pt")
+    inputs = {key: val.to(model.device) for key, val in inputs.items()}
+    with torch.inference_mode():
+        outputs = model(**inputs)
+    return torch.softmax(outputs.logits.float(), dim=1).cpu()
+
+
+# Function to quantize the Linear layers of a classifier to int8
+def quantize_int8(model):
+    """Returns a dynamically int8-quantized CPU copy of the model."""
+    cpu_model = copy.deepcopy(model).to("cpu").eval()
+    return torch.ao.quantization.quantize_dynamic(cpu_model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# Wrapper so the ONNX graph returns plain logits instead of a ModelOutput
+class LogitsOnly(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).logits
+
+
+# Function to export the fine-tuned model for the CPU inference backends
+def export_backends(model_dir, model, tokenizer, formats=EXPORT_FORMATS):
+    """Writes an int8-quantized model and/or an ONNX graph into the model directory."""
+    if "int8" in formats:
+        path = os.path.join(model_dir, INT8_MODEL_FILE)
+        torch.save(quantize_int8(model), path)
+        print(f"Saved int8 model to {path}")
+
+    if "onnx" in formats:
+        path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        sample = tokenizer(["What is the interest rate?"], return_tensors="pt")
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUTS}
+        dynamic_axes["logits"] = {0: "batch"}
+        try:
+            torch.onnx.export(
+                LogitsOnly(copy.deepcopy(model).to("cpu").eval()),
+                tuple(sample[name] for name in ONNX_INPUTS),
+                path,
+                input_names=list(ONNX_INPUTS),
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+            print(f"Saved ONNX model to {path}")
+        except ImportError as e:
+            print(f"Skipping ONNX export ({e}); install onnx to enable it")
+
+
+# ONNX Runtime session that can be used wherever the torch classifier is
+class OnnxClassifier:
+    """Runs the exported ONNX graph and mimics the parts of the torch model predict uses."""
+
+    def __init__(self, model_dir):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The onnx backend needs onnxruntime: pip install onnxruntime") from e
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE), providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {graph_input.name for graph_input in self.session.get_inputs()}
+        self.config = AutoConfig.from_pretrained(model_dir)
+        self.device = torch.device("cpu")
+
+    def __call__(self, **inputs):
+        feeds = {key: val.cpu().numpy() for key, val in inputs.items() if key in self.input_names}
+        if "token_type_ids" in self.input_names and "token_type_ids" not in feeds:
+            feeds["token_type_ids"] = torch.zeros_like(inputs["input_ids"]).numpy()
+        logits = self.session.run(["logits"], feeds)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+# Function to load the classifier for a CPU inference backend
+def load_classifier(model_dir, backend="torch"):
+    """Loads the fine-tuned classifier as torch fp32, torch int8 or ONNX Runtime."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; choose one of {', '.join(BACKENDS)}")
+    if backend == "onnx":
+        return OnnxClassifier(model_dir)
+    if backend == "torch-int8":
+        path = os.path.join(model_dir, INT8_MODEL_FILE)
+        if os.path.exists(path):
+            # The exported file holds the quantized module, so the fp32 weights are never loaded
+            return torch.load(path, weights_only=False).eval()
+        print(f"{path} not found, quantizing the fp32 model at load time")
+        return quantize_int8(BertForSequenceClassification.from_pretrained(model_dir))
+    return BertForSequenceClassification.from_pretrained(model_dir).eval()
+
+
+# Class order and answers saved next to the fine-tuned model
+class LabelIndex:
+    """Maps class indices to labels and canned answers in O(1).
+
+    Written by ``bert_train.py`` as ``label_index.json`` in the model
+    directory, so inference needs neither pandas nor a refitted LabelEncoder.
+    ``translations`` maps a language code to the answers in that language.
+    """
+
+    def __init__(self, classes, answers, translations=None):
+        if len(classes) != len(answers):
+            raise ValueError(f"Label index has {len(classes)} classes but {len(answers)} answers")
+        self.classes = [str(label) for label in classes]
+        self.answers = list(answers)
+        self.translations = dict(translations or {})
+
+    @classmethod
+    def load(cls, model_dir):
+        """Loads the label index saved in a model directory."""
+        path = os.path.join(model_dir, LABEL_INDEX_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"{path} not found. Models trained before the label index existed can get one without retraining: "
+                f"python bert_inference.py --model-dir \"{model_dir}\" --data clean_data.csv"
+            )
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["classes"], data["answers"], data.get("translations"))
+
+    @classmethod
+    def from_csv(cls, data_path="clean_data.csv"):
+        """Rebuilds the label index ``bert_train.py`` writes from the FAQ dataset it was trained on.
+
+        Classes are sorted as LabelEncoder sorts them and each class gets its
+        first answer in the CSV, which is what training saves.
+        """
+        import numpy as np
+        import pandas as pd
+
+        df = pd.read_csv(data_path, usecols=["answers", "labels"])
+        first_answers = df.drop_duplicates("labels").set_index("labels")["answers"]
+        classes = np.unique(df["labels"])
+        return cls(classes, [first_answers[label] for label in classes])
+
+    def save(self, model_dir):
+        """Writes the label index into a model directory."""
+        with open(os.path.join(model_dir, LABEL_INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {"classes": self.classes, "answers": self.answers, "translations": self.translations},
+                f, ensure_ascii=False, indent=2
+            )
+
+    def check_model(self, model):
+        """Raises ValueError unless the model was trained with this class order."""
+        config = model.config
+        if config.num_labels != len(self.classes):
+            raise ValueError(
+                f"Model has {config.num_labels} labels but the label index has {len(self.classes)} classes"
+            )
+        model_classes = [str(config.id2label[i]) for i in range(config.num_labels)]
+        if model_classes == [f"LABEL_{i}" for i in range(config.num_labels)]:
+            print("Warning: model config has no class names, so the label index order cannot be verified")
+        elif model_classes != self.classes:
+            raise ValueError("Label index class order does not match the order the model was trained with")
+
+    def answer(self, predicted_label_idx, language="en"):
+        """Returns the canned answer for a class index, in ``language`` when it was precomputed."""
+        if language != "en" and language in self.translations:
+            return self.translations[language][predicted_label_idx]
+        return self.answers[predicted_label_idx]
+
+
+# Predict function to interact with the model
+def predict(question, model, tokenizer, label_index):
+    """Returns the canned answer for the class the model predicts for the question."""
+    predicted_label_idx = predict_label_indices([question], model, tokenizer)[0]
+    return label_index.answer(predicted_label_idx)
+
+
+# In-process inference server that groups concurrent questions into micro-batches
+class MicroBatcher:
+    """Collects concurrent requests and runs them through ``predict_fn`` in batches.
+
+    ``predict_fn`` takes a list of questions and returns one result per
+    question. A batch is run as soon as it holds ``max_batch_size`` questions
+    or ``max_wait_ms`` after its first question arrived, whichever is first.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=10):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.thread = None
+        self.batches = 0
+        self.requests = 0
+
+    def start(self):
+        """Starts the batching thread."""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="bert-micro-batcher", daemon=True)
+            self.thread.start()
+        return self
+
+    def submit(self, question):
+        """Queues a question and returns a Future that resolves to its result."""
+        future = Future()
+        self.queue.put((question, future))
+        return future
+
+    def stop(self):
+        """Stops the batching thread after the queued requests are served."""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def average_batch_size(self):
+        """Returns the mean number of questions per forward pass so far."""
+        return self.requests / self.batches if self.batches else 0.0
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # Callers that cancelled their Future while it was queued are dropped from the batch
+            batch = [(question, future) for question, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                questions = [question for question, _ in batch]
+                try:
+                    results = self.predict_fn(questions)
+                    for (_, future), result in zip(batch, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                self.batches += 1
+                self.requests += len(batch)
+            if stopping:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build label_index.json for a model trained before it was saved.")
+    parser.add_argument("--model-dir", default="./bert_chatbot_model")
+    parser.add_argument("--data", default="clean_data.csv", help="The FAQ dataset the model was trained on")
+    args = parser.parse_args()
+
+    label_index = LabelIndex.from_csv(args.data)
+    # Refuses to write an index whose class count or order does not match the model
+    label_index.check_model(SimpleNamespace(config=AutoConfig.from_pretrained(args.model_dir)))
+    label_index.save(args.model_dir)
+    print(f"Saved {len(label_index.classes)} classes to {os.path.join(args.model_dir, LABEL_INDEX_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
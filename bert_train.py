@@ -1,61 +1,42 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 import torch
-from transformers import BertTokenizer, BertForSequenceClassification, Trainer, TrainingArguments
+from transformers import BertConfig, BertTokenizer, BertForSequenceClassification, Trainer, TrainerCallback, TrainingArguments
 import random
+import argparse
+import copy
+import os
+import time
+from augmentation import DEFAULT_RULE_SETS, load_rule_sets
+from benchmarking import latency_summary, peak_rss_mb
+from faq_dataset import load_splits
+from tokenization_cache import tokenize_cached
+from translation import TRANSLATION_BACKENDS, TranslationService, translate_answers
+from bert_inference import EXPORT_FORMATS, LabelIndex, export_backends, predict, predict_label_indices
 
 # =========================================
 # Step 1: Load and Double the Dataset
 # =========================================
-def augment_data(df):
-    augmented_data = []
-    for _, row in df.iterrows():
-        # Convert the row to a dictionary
-        original_row = row.to_dict()
-        augmented_data.append(original_row)
-
-        # Create a synthetic variation of the question
-        synthetic_question = row["questions"].replace("What", "Tell me about").replace("How", "Explain").replace("Can", "Is it possible to")
-        augmented_row = original_row.copy()
-        augmented_row["questions"] = synthetic_question
-
-        # Append the synthetic row
-        augmented_data.append(augmented_row)
-
-    return pd.DataFrame(augmented_data)
-
-
-# Load dataset
-df = pd.read_csv("clean_data.csv")  # Ensure columns are `questions`, `answers`, `labels`
-
-# Double the dataset
-df_augmented = augment_data(df)
-
-# Encode labels
-label_encoder = LabelEncoder()
-df_augmented["label_encoded"] = label_encoder.fit_transform(df_augmented["labels"])
-
-# Split into train and validation sets
-train_df, val_df = train_test_split(df_augmented, test_size=0.2, random_state=42)
-
-# Save label mapping for later
-label_mapping = dict(zip(label_encoder.classes_, label_encoder.transform(label_encoder.classes_)))
+# load_splits lives in faq_dataset.py, so benchmarks can load the data without the training stack
 
 # =========================================
 # Step 2: Tokenize Questions
 # =========================================
-tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
-
-def tokenize_data(dataframe):
+def tokenize_data(dataframe, tokenizer):
     return tokenizer(list(dataframe["questions"]), truncation=True, padding=True, max_length=128, return_tensors="pt")
 
-train_encodings = tokenize_data(train_df)
-val_encodings = tokenize_data(val_df)
+# Function to tokenize without padding and pack every question into one flat tensor
+def tokenize_packed(dataframe, tokenizer, split_name, cache_dir=".token_cache", workers=None):
+    """Returns all token ids concatenated in one tensor plus the start offset of each question.
 
-# Convert labels to tensors
-train_labels = torch.tensor(list(train_df["label_encoded"]))
-val_labels = torch.tensor(list(val_df["label_encoded"]))
+    Splits are cached on disk (see tokenization_cache.py), so unchanged data is not tokenized again.
+    """
+    input_ids, offsets, info = tokenize_cached(
+        list(dataframe["questions"]), tokenizer, max_length=128, cache_dir=cache_dir, workers=workers
+    )
+    if info["hit"]:
+        print(f"Tokenization cache hit for {split_name} split: loaded in {info['seconds']:.2f}s, saved {info['saved_seconds']:.1f}s")
+    else:
+        print(f"Tokenized {split_name} split in {info['seconds']:.1f}s (cached for the next run)")
+    return input_ids, offsets
 
 # =========================================
 # Step 3: Define the Dataset Class
@@ -69,68 +50,285 @@ class CustomDataset(torch.utils.data.Dataset):
         return len(self.labels)
 
     def __getitem__(self, idx):
-        item = {key: torch.tensor(val[idx]) for key, val in self.encodings.items()}
+        # The encodings are already tensors, so index them instead of copying with torch.tensor
+        item = {key: val[idx] for key, val in self.encodings.items()}
         item["labels"] = self.labels[idx]
         return item
 
-train_dataset = CustomDataset(train_encodings, train_labels)
-val_dataset = CustomDataset(val_encodings, val_labels)
+# Dataset over packed token ids: each item is a view into the flat tensor, nothing is copied
+class PackedDataset(torch.utils.data.Dataset):
+    def __init__(self, input_ids, offsets, labels):
+        self.input_ids = input_ids
+        self.offsets = offsets
+        self.labels = labels
 
-# =========================================
-# Step 4: Load Pre-trained BERT Model
-# =========================================
-num_labels = len(label_mapping)  # Number of unique labels
-model = BertForSequenceClassification.from_pretrained("bert-base-uncased", num_labels=num_labels)
+    def __len__(self):
+        return len(self.labels)
 
-# =========================================
-# Step 5: Define Training Arguments
-# =========================================
-training_args = TrainingArguments(
-    output_dir="./results",          # Directory to save model checkpoints
-    evaluation_strategy="epoch",    # Evaluate at the end of each epoch
-    learning_rate=2e-5,             # Learning rate
-    per_device_train_batch_size=16, # Batch size for training
-    per_device_eval_batch_size=16,  # Batch size for evaluation
-    num_train_epochs=3,             # Number of epochs
-    weight_decay=0.01,              # Weight decay
-    logging_dir="./logs",           # Logging directory
-    logging_steps=10,
-    save_strategy="epoch",          # Save model after each epoch
-)
-
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=train_dataset,
-    eval_dataset=val_dataset,
-)
+    def __getitem__(self, idx):
+        start, end = self.offsets[idx].item(), self.offsets[idx + 1].item()
+        return {"input_ids": self.input_ids[start:end], "labels": self.labels[idx]}
 
-# =========================================
-# Step 6: Train the Model
-# =========================================
-trainer.train()
+# Collator that pads each batch only to its own longest question
+class DynamicPaddingCollator:
+    def __init__(self, pad_token_id):
+        self.pad_token_id = pad_token_id
 
-# =========================================
-# Step 7: Save the Fine-Tuned Model
-# =========================================
-model.save_pretrained("./bert_chatbot_model")
-tokenizer.save_pretrained("./bert_chatbot_model")
+    def __call__(self, features):
+        sequences = [feature["input_ids"] for feature in features]
+        lengths = torch.tensor([len(sequence) for sequence in sequences])
+        input_ids = torch.nn.utils.rnn.pad_sequence(sequences, batch_first=True, padding_value=self.pad_token_id).long()
+        attention_mask = (torch.arange(input_ids.shape[1])[None, :] < lengths[:, None]).long()
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": torch.zeros_like(input_ids),
+            "labels": torch.stack([torch.as_tensor(feature["labels"]) for feature in features]),
+        }
+
+# Callback that reports the time and peak memory of every training epoch
+class EpochStatsCallback(TrainerCallback):
+    def __init__(self):
+        self.epoch_start = None
+        self.epoch_seconds = []
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+        self.epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        elapsed = time.perf_counter() - self.epoch_start
+        self.epoch_seconds.append(elapsed)
+        print(f"Epoch {len(self.epoch_seconds)}: {elapsed:.1f}s, peak memory {peak_memory_mb():.0f} MB")
+
+# Trainer that fits a small student to the softened predictions of a fine-tuned teacher
+class DistillationTrainer(Trainer):
+    """Trains on ``alpha`` x KL(teacher || student) at ``temperature`` plus (1 - ``alpha``) x the label loss."""
+
+    def __init__(self, *args, teacher=None, temperature=2.0, alpha=0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.teacher = teacher.to(self.args.device).eval()
+        for param in self.teacher.parameters():
+            param.requires_grad_(False)
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        outputs = model(**inputs)
+        with torch.no_grad():
+            teacher_logits = self.teacher(**{key: val for key, val in inputs.items() if key != "labels"}).logits
+        # Scaling by T^2 keeps the soft-target gradients the same size as the label loss's
+        soft_loss = torch.nn.functional.kl_div(
+            torch.log_softmax(outputs.logits / self.temperature, dim=-1),
+            torch.softmax(teacher_logits / self.temperature, dim=-1),
+            reduction="batchmean",
+        ) * self.temperature ** 2
+        loss = self.alpha * soft_loss + (1 - self.alpha) * outputs.loss
+        return (loss, outputs) if return_outputs else loss
+
+# Function to build the student model: the first layers of a pre-trained BERT
+def build_student(init_model, num_labels, num_layers=None):
+    """Returns a BertForSequenceClassification with ``num_layers`` layers initialized from ``init_model``.
+
+    It keeps BERT's vocabulary, so the student loads with the same tokenizer and code as the teacher.
+    """
+    overrides = {"num_hidden_layers": num_layers} if num_layers else {}
+    config = BertConfig.from_pretrained(init_model, num_labels=num_labels, **overrides)
+    return BertForSequenceClassification.from_pretrained(init_model, config=config)
+
+# Function to measure a classifier the way the app serves it: one question at a time on the CPU
+def evaluate_for_serving(model, tokenizer, questions, labels, latency_samples=100):
+    """Returns the accuracy, parameter size in MB and p50/p95 single-question CPU latency of a model."""
+    cpu_model = copy.deepcopy(model).to("cpu").eval()
+    predictions = []
+    for i in range(0, len(questions), 32):
+        predictions.extend(predict_label_indices(questions[i:i + 32], cpu_model, tokenizer))
+    latencies = []
+    for question in (questions * latency_samples)[:latency_samples]:
+        start = time.perf_counter()
+        predict_label_indices([question], cpu_model, tokenizer)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "accuracy": sum(p == t for p, t in zip(predictions, labels)) / len(labels),
+        "size_mb": sum(param.numel() * param.element_size() for param in cpu_model.parameters()) / 2**20,
+        "layers": cpu_model.config.num_hidden_layers,
+        **latency_summary(latencies),
+    }
+
+# Function to read the peak memory of the training process
+def peak_memory_mb():
+    """Returns peak GPU memory when training on CUDA, otherwise the peak process RSS."""
+    if torch.cuda.is_available():
+        return torch.cuda.max_memory_allocated() / 2**20
+    return peak_rss_mb()
 
 # =========================================
-# Step 8: Inference
+# Training run
 # =========================================
-def predict(question, model, tokenizer, df, label_encoder):
-    # Tokenize the input question
-    inputs = tokenizer(question, truncation=True, padding=True, max_length=128, return_tensors="pt")
-    outputs = model(**inputs)
-    predicted_label_idx = torch.argmax(outputs.logits, dim=1).item()
-
-    # Decode the label and retrieve the answer
-    predicted_label = label_encoder.inverse_transform([predicted_label_idx])[0]
-    answer = df[df["labels"] == predicted_label]["answers"].iloc[0]
-    return answer
-
-# Example inference
-question = "What is the interest rate?"
-answer = predict(question, model, tokenizer, df, label_encoder)
-print(f"Question: {question}\nAnswer: {answer}")
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune BERT on the credit policy FAQ dataset.")
+    parser.add_argument("--data", default="clean_data.csv")
+    parser.add_argument("--output-dir", default="./bert_chatbot_model")
+    parser.add_argument("--augment-rules", help="JSON file with extra question rewrite rule sets")
+    parser.add_argument("--dedupe", action="store_true", help="Drop synthetic questions identical to an original")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Training questions augmented per chunk")
+    parser.add_argument(
+        "--padding", choices=["dynamic", "global"], default="dynamic",
+        help="dynamic pads each length-bucketed batch; global pads every question to the longest one"
+    )
+    parser.add_argument("--token-cache-dir", default=".token_cache", help="Where tokenized splits are cached")
+    parser.add_argument("--tokenize-workers", type=int, help="Processes used to tokenize a cold cache (default: all cores)")
+    parser.add_argument("--answer-languages", nargs="*", default=["hi"], help="Languages to precompute answers in")
+    parser.add_argument("--translation-backend", choices=TRANSLATION_BACKENDS, default="googletrans")
+    parser.add_argument(
+        "--export", nargs="*", default=list(EXPORT_FORMATS), choices=EXPORT_FORMATS,
+        help="CPU inference backends to export after training (none to skip)"
+    )
+    parser.add_argument("--distill-from", help="Fine-tuned model directory to use as teacher for a small student model")
+    parser.add_argument("--student-init", default="bert-base-uncased", help="Pre-trained BERT the student starts from")
+    parser.add_argument("--student-layers", type=int, default=4, help="Transformer layers kept in the student (0 = all)")
+    parser.add_argument("--distill-temperature", type=float, default=2.0)
+    parser.add_argument("--distill-alpha", type=float, default=0.5, help="Weight of the soft targets against the labels")
+    args = parser.parse_args()
+    if args.distill_from and os.path.abspath(args.distill_from) == os.path.abspath(args.output_dir):
+        parser.error("--output-dir must differ from --distill-from, or the student would overwrite its teacher")
+
+    rule_sets = DEFAULT_RULE_SETS
+    if args.augment_rules:
+        rule_sets = DEFAULT_RULE_SETS + load_rule_sets(args.augment_rules)
+    df, train_df, val_df, label_encoder = load_splits(
+        args.data, rule_sets=rule_sets, dedupe=args.dedupe, chunksize=args.chunksize
+    )
+
+    # Save label mapping for later
+    label_mapping = dict(zip(label_encoder.classes_, label_encoder.transform(label_encoder.classes_)))
+
+    # Step 2: Tokenize Questions
+    tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
+
+    # Convert labels to tensors
+    train_labels = torch.tensor(list(train_df["label_encoded"]))
+    val_labels = torch.tensor(list(val_df["label_encoded"]))
+
+    # Step 3: Build the datasets
+    if args.padding == "dynamic":
+        train_dataset = PackedDataset(
+            *tokenize_packed(train_df, tokenizer, "train", args.token_cache_dir, args.tokenize_workers), train_labels
+        )
+        val_dataset = PackedDataset(
+            *tokenize_packed(val_df, tokenizer, "validation", args.token_cache_dir, args.tokenize_workers), val_labels
+        )
+        data_collator = DynamicPaddingCollator(tokenizer.pad_token_id)
+    else:
+        train_dataset = CustomDataset(tokenize_data(train_df, tokenizer), train_labels)
+        val_dataset = CustomDataset(tokenize_data(val_df, tokenizer), val_labels)
+        data_collator = None
+
+    # =========================================
+    # Step 4: Load Pre-trained BERT Model
+    # =========================================
+    num_labels = len(label_mapping)  # Number of unique labels
+    teacher = None
+    if args.distill_from:
+        # The teacher's soft targets only mean something if its classes are in the same order
+        teacher = BertForSequenceClassification.from_pretrained(args.distill_from)
+        LabelIndex(label_encoder.classes_, [""] * num_labels).check_model(teacher)
+        model = build_student(args.student_init, num_labels, args.student_layers)
+        print(f"Distilling {args.distill_from} into a {model.config.num_hidden_layers}-layer student")
+    else:
+        model = BertForSequenceClassification.from_pretrained("bert-base-uncased", num_labels=num_labels)
+
+    # =========================================
+    # Step 5: Define Training Arguments
+    # =========================================
+    training_args = TrainingArguments(
+        output_dir="./results",          # Directory to save model checkpoints
+        evaluation_strategy="epoch",    # Evaluate at the end of each epoch
+        learning_rate=5e-5 if teacher is not None else 2e-5,  # Learning rate (the smaller student learns faster)
+        per_device_train_batch_size=16, # Batch size for training
+        per_device_eval_batch_size=16,  # Batch size for evaluation
+        num_train_epochs=3,             # Number of epochs
+        weight_decay=0.01,              # Weight decay
+        logging_dir="./logs",           # Logging directory
+        logging_steps=10,
+        save_strategy="epoch",          # Save model after each epoch
+        group_by_length=args.padding == "dynamic",  # Batch questions of similar length together
+    )
+
+    epoch_stats = EpochStatsCallback()
+    distillation = {}
+    if teacher is not None:
+        distillation = {"teacher": teacher, "temperature": args.distill_temperature, "alpha": args.distill_alpha}
+    trainer = (DistillationTrainer if teacher is not None else Trainer)(
+        model=model,
+        args=training_args,
+        train_dataset=train_dataset,
+        eval_dataset=val_dataset,
+        data_collator=data_collator,
+        callbacks=[epoch_stats],
+        **distillation,
+    )
+
+    # =========================================
+    # Step 6: Train the Model
+    # =========================================
+    trainer.train()
+    mean_epoch = sum(epoch_stats.epoch_seconds) / len(epoch_stats.epoch_seconds)
+    print(f"Padding '{args.padding}': mean epoch time {mean_epoch:.1f}s, peak memory {peak_memory_mb():.0f} MB")
+
+    # =========================================
+    # Step 7: Save the Fine-Tuned Model
+    # =========================================
+    # Record the class order in the model config so inference can verify it
+    model.config.id2label = {i: str(label) for i, label in enumerate(label_encoder.classes_)}
+    model.config.label2id = {str(label): i for i, label in enumerate(label_encoder.classes_)}
+
+    # safetensors weights let the app memory-map the model instead of unpickling it
+    model.save_pretrained(args.output_dir, safe_serialization=True)
+    tokenizer.save_pretrained(args.output_dir)
+
+    # Save the class order and one answer per class for O(1) lookups at inference time
+    # (each label's first answer in the CSV, whether or not that row was held out for validation)
+    first_answers = df.drop_duplicates("labels").set_index("labels")["answers"]
+    label_index = LabelIndex(label_encoder.classes_, [first_answers[label] for label in label_encoder.classes_])
+
+    # Precompute translated answers so the app never translates a canned answer at request time
+    if args.answer_languages:
+        try:
+            service = TranslationService(TRANSLATION_BACKENDS[args.translation_backend]())
+            translate_answers(label_index, service, args.answer_languages)
+        except Exception as e:
+            print(f"Skipping answer translation ({e}); run translation.py later to add it")
+    label_index.save(args.output_dir)
+
+    # =========================================
+    # Step 8: Export CPU Inference Backends
+    # =========================================
+    if args.export:
+        export_backends(args.output_dir, model, tokenizer, formats=args.export)
+
+    # =========================================
+    # Step 9: Compare Student and Teacher
+    # =========================================
+    if teacher is not None:
+        questions, labels = list(val_df["questions"]), list(val_df["label_encoded"])
+        print(f"{'model':<9}{'layers':>7}{'size MB':>9}{'accuracy':>10}{'p50 ms':>9}{'p95 ms':>9}")
+        for name, candidate in [("teacher", teacher), ("student", model)]:
+            report = evaluate_for_serving(candidate, tokenizer, questions, labels)
+            print(
+                f"{name:<9}{report['layers']:>7}{report['size_mb']:>9.0f}{report['accuracy']:>10.3f}"
+                f"{report['p50_ms']:>9.1f}{report['p95_ms']:>9.1f}"
+            )
+
+    # =========================================
+    # Step 10: Inference
+    # =========================================
+    # Example inference
+    question = "What is the interest rate?"
+    answer = predict(question, model, tokenizer, label_index)
+    print(f"Question: {question}\nAnswer: {answer}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import json
+import os
+import time
+
+
+# Chat messages of one session with a bounded in-memory window
+class ChatHistory:
+    """Keeps the newest ``window`` messages in memory and archives older ones to disk.
+
+    Archived messages are appended to a JSON-lines file at ``archive_path``;
+    their byte offsets are remembered so a page of older messages can be
+    read back without loading the whole archive.
+    """
+
+    def __init__(self, archive_path, window=40):
+        self.archive_path = archive_path
+        self.window = window
+        self.messages = []
+        self.archive_offsets = []
+
+    @property
+    def archived(self):
+        """Number of messages moved to the archive file."""
+        return len(self.archive_offsets)
+
+    def __len__(self):
+        return self.archived + len(self.messages)
+
+    def append(self, message):
+        """Adds a message, archiving the oldest in-memory ones beyond the window."""
+        self.messages.append(message)
+        if len(self.messages) > self.window:
+            overflow = len(self.messages) - self.window
+            self._archive(self.messages[:overflow])
+            self.messages = self.messages[overflow:]
+
+    def _forget_expired_archive(self):
+        # remove_stale_archives deleted the file while this session sat idle, so its older messages are gone
+        if self.archive_offsets and not os.path.exists(self.archive_path):
+            self.archive_offsets = []
+
+    def _archive(self, messages):
+        self._forget_expired_archive()
+        directory = os.path.dirname(self.archive_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.archive_path, "ab") as f:
+            f.seek(0, os.SEEK_END)
+            for message in messages:
+                self.archive_offsets.append(f.tell())
+                f.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def slice(self, start, end=None):
+        """Returns messages ``start`` to ``end`` of the whole conversation, reading archived ones from disk."""
+        self._forget_expired_archive()
+        end = len(self) if end is None else min(end, len(self))
+        start = max(0, start)
+        result = []
+        if start < min(end, self.archived):
+            with open(self.archive_path, "rb") as f:
+                f.seek(self.archive_offsets[start])
+                result = [json.loads(f.readline()) for _ in range(min(end, self.archived) - start)]
+        result.extend(self.messages[max(0, start - self.archived):max(0, end - self.archived)])
+        return result
+
+    def last(self, count):
+        """Returns the last ``count`` messages."""
+        return self.slice(len(self) - count)
+
+    def clear(self):
+        """Forgets every message and deletes the archive file."""
+        self.messages = []
+        self.archive_offsets = []
+        if os.path.exists(self.archive_path):
+            os.remove(self.archive_path)
+
+
+# Function to delete the archives of sessions that ended without a reset or logout
+def remove_stale_archives(directory, max_age_seconds):
+    """Deletes archive files in ``directory`` not written to for ``max_age_seconds``; returns how many."""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    with os.scandir(directory) as scan:
+        for entry in scan:
+            if entry.is_file() and entry.name.endswith(".jsonl") and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError as e:
+                    print(f"Error removing chat archive {entry.path}: {e}")
+    return removed
@@ -0,0 +1,138 @@
+import re
+
+from policy_retrieval import estimate_tokens, tokenize
+
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s")
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Openings and words that only make sense after an earlier turn ("and for LAP?", "is it refundable?")
+FOLLOW_UP_OPENERS = ("and", "what about", "how about", "for", "also", "then", "so", "but", "same")
+FOLLOW_UP_WORDS = {
+    "it", "its", "it's", "that", "this", "those", "these", "they", "them", "their", "he", "she", "him", "her",
+    "his", "above", "previous", "earlier", "same", "mentioned", "else", "more",
+}
+
+
+# Function to tell whether a question leans on the earlier conversation
+def is_follow_up(question):
+    """Returns True for elliptical or anaphoric questions that need the earlier turns to be understood.
+
+    A question that opens like a continuation, refers back with a pronoun or
+    has no subject of its own ("why?") is a follow-up; anything else can be
+    answered, and cached, on its own.
+    """
+    words = WORD_PATTERN.findall(question.lower())
+    text = " ".join(words)
+    if any(text == opener or text.startswith(opener + " ") for opener in FOLLOW_UP_OPENERS):
+        return True
+    return any(word in FOLLOW_UP_WORDS for word in words) or not tokenize(question)
+
+
+# Function to shorten a chat message to its first sentence
+def first_sentence(text, max_chars=160):
+    """Returns the first sentence of a message, cut to ``max_chars`` characters."""
+    text = " ".join(text.split())
+    sentence = SENTENCE_END_PATTERN.split(text, maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars - 3].rstrip() + "..."
+
+
+# Function to fold older chat turns into a short running summary without an LLM call
+def extractive_summary(summary, messages):
+    """Appends one line per message (question, first sentence of the answer) to the summary."""
+    lines = [summary] if summary else []
+    for message in messages:
+        prefix = "User asked" if message["role"] == "user" else "Assistant answered"
+        lines.append(f"- {prefix}: {first_sentence(message['content'])}")
+    return "\n".join(lines)
+
+
+# Function to keep the last lines of a text within a token budget
+def trim_to_budget(text, token_budget):
+    """Drops the oldest lines of a text until it fits the token budget."""
+    lines = text.splitlines()
+    while lines and estimate_tokens("\n".join(lines)) > token_budget:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+# Function to size the chat window so no message is archived before it is summarized
+def min_window_messages(recent_turns):
+    """Returns the smallest in-memory chat window that works with ``recent_turns``.
+
+    Between two questions the window must hold the recent turns, the answer
+    and question added since, and the last message already summarized.
+    """
+    return 2 * recent_turns + 3
+
+
+# Per-session conversation memory that keeps the prompt size bounded
+class ConversationMemory:
+    """Builds the conversation context sent with each question.
+
+    The last ``recent_turns`` question/answer pairs are kept verbatim and
+    older messages are folded into a rolling summary by ``summarizer``
+    (``summarizer(summary, messages) -> summary``). Summary and recent turns
+    together never exceed ``token_budget`` tokens.
+    """
+
+    def __init__(self, token_budget=800, recent_turns=3, summarizer=extractive_summary):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summarizer = summarizer
+        self.summary = ""
+        self.summarized_count = 0
+
+    def reset(self):
+        """Forgets the rolling summary."""
+        self.summary = ""
+        self.summarized_count = 0
+
+    def build(self, messages, offset=0):
+        """Returns the context text for the given chat history and its token count.
+
+        ``messages`` is the chat history before the current question, as stored
+        in the session's ``ChatHistory``; ``offset`` is the position of its first
+        message when older messages have been archived.
+        """
+        end = offset + len(messages)
+        if end < self.summarized_count:
+            self.reset()
+        # The greeting shown before the first question carries no context
+        if offset == 0:
+            start = next((i for i, message in enumerate(messages) if message["role"] == "user"), end)
+            self.summarized_count = max(self.summarized_count, start)
+        # Messages archived before they were summarized are out of reach; a window of at least
+        # min_window_messages(recent_turns) never archives them that early
+        self.summarized_count = max(self.summarized_count, offset)
+
+        recent_start = max(self.summarized_count, end - 2 * self.recent_turns)
+        recent = messages[recent_start - offset:]
+        summary_budget = self.token_budget // 2
+
+        # Older turns that are no longer kept verbatim go into the summary, along
+        # with the oldest recent turns when the verbatim part is over budget
+        while recent and estimate_tokens(self.format_turns(recent)) > self.token_budget - summary_budget:
+            recent = recent[1:]
+            recent_start += 1
+        if recent_start > self.summarized_count:
+            self.summary = self.summarizer(
+                self.summary, messages[self.summarized_count - offset:recent_start - offset]
+            )
+            self.summarized_count = recent_start
+        self.summary = trim_to_budget(self.summary, summary_budget)
+
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation:\n{self.summary}")
+        if recent:
+            parts.append(f"Recent conversation:\n{self.format_turns(recent)}")
+        text = "\n\n".join(parts)
+        return {"text": text, "tokens": estimate_tokens(text), "recent_messages": len(recent)}
+
+    @staticmethod
+    def format_turns(messages):
+        """Formats chat messages as ``User:`` / ``Assistant:`` lines."""
+        return "\n".join(
+            f"{'User' if message['role'] == 'user' else 'Assistant'}: {message['content']}"
+            for message in messages
+        )
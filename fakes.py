@@ -0,0 +1,175 @@
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+RANGE_START_PATTERN = re.compile(r"^[A-Z]+(\d+)")
+
+
+# Error raised by the fakes, standing in for gspread / Gemini API errors
+class FakeAPIError(Exception):
+    """Simulated API failure."""
+
+
+# Error raised when the fake Gemini model is over its simulated quota (HTTP 429)
+class FakeRateLimitError(FakeAPIError):
+    code = 429
+
+
+# Local stand-in for a gspread worksheet
+class FakeWorksheet:
+    """In-memory worksheet with configurable latency and failures.
+
+    ``fail_next`` makes the next N calls raise ``FakeAPIError`` and
+    ``error_rate`` makes any call fail with that probability.
+    """
+
+    def __init__(self, rows=None, latency=0.0, error_rate=0.0, fail_next=0, seed=None):
+        self.rows = [list(row) for row in (rows or [])]
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_next = fail_next
+        self.calls = 0
+        self.random = random.Random(seed)
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise FakeAPIError("simulated Sheets outage")
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise FakeAPIError("simulated Sheets error")
+
+    def append_row(self, values, value_input_option="RAW"):
+        self._call()
+        self.rows.append(list(values))
+
+    def append_rows(self, values, value_input_option="RAW"):
+        self._call()
+        self.rows.extend(list(row) for row in values)
+
+    def get_all_records(self):
+        self._call()
+        if not self.rows:
+            return []
+        header = self.rows[0]
+        return [dict(zip(header, row)) for row in self.rows[1:]]
+
+    def get_values(self, range_name=None):
+        """Returns rows as lists; supports open-ended ranges such as ``"A5:C"``."""
+        self._call()
+        if range_name is None:
+            return [list(row) for row in self.rows]
+        match = RANGE_START_PATTERN.match(range_name)
+        start = int(match.group(1)) if match else 1
+        return [list(row) for row in self.rows[start - 1:]]
+
+
+# Local stand-in for a gspread spreadsheet that always opens the same worksheet
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.sheet1 = worksheet
+
+
+# Local stand-in for the client returned by gspread.authorize
+class FakeSheetsClient:
+    def __init__(self, worksheet):
+        self.spreadsheet = FakeSpreadsheet(worksheet)
+
+    def open(self, name):
+        return self.spreadsheet
+
+    def create(self, name):
+        return self.spreadsheet
+
+
+# Response of the fake Gemini model; mirrors the attributes the app reads
+class FakeResponse:
+    def __init__(self, text, prompt_tokens=0, output_tokens=0):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens,
+        )
+
+
+# Local stand-in for genai.GenerativeModel
+class FakeGenerativeModel:
+    """Answers every prompt with ``output_tokens`` words after a simulated generation delay.
+
+    An answer takes ``first_token_latency`` plus ``token_latency`` per output
+    token; streamed answers arrive in chunks of ``chunk_tokens``. Failures
+    work as in ``FakeWorksheet``; ``rate_limit_next`` and ``rate_limit_rate``
+    do the same with ``FakeRateLimitError``. ``max_concurrency`` tracks the
+    most calls that were ever running at once.
+    """
+
+    ANSWER_WORDS = "As per the credit policy the applicable terms depend on the product and the borrower profile".split()
+
+    def __init__(self, model_name="fake-gemini", first_token_latency=0.0, token_latency=0.0, output_tokens=120,
+                 chunk_tokens=20, error_rate=0.0, fail_next=0, rate_limit_rate=0.0, rate_limit_next=0, seed=None):
+        self.model_name = model_name
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.output_tokens = output_tokens
+        self.chunk_tokens = chunk_tokens
+        self.error_rate = error_rate
+        self.fail_next = fail_next
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limit_next = rate_limit_next
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.running = 0
+        self.max_concurrency = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _call(self, prompt):
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += len(prompt) // 4
+            if self.rate_limit_next > 0:
+                self.rate_limit_next -= 1
+                raise FakeRateLimitError("simulated Gemini quota exceeded")
+            if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+                raise FakeRateLimitError("simulated Gemini quota exceeded")
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                raise FakeAPIError("simulated Gemini outage")
+            if self.error_rate and self.random.random() < self.error_rate:
+                raise FakeAPIError("simulated Gemini error")
+
+    def _words(self):
+        return [self.ANSWER_WORDS[i % len(self.ANSWER_WORDS)] for i in range(self.output_tokens)]
+
+    def _running(self, delta):
+        with self.lock:
+            self.running += delta
+            self.max_concurrency = max(self.max_concurrency, self.running)
+
+    def generate_content(self, prompt, stream=False):
+        self._call(prompt)
+        if stream:
+            return self._stream(prompt)
+        self._running(1)
+        try:
+            time.sleep(self.first_token_latency + self.token_latency * self.output_tokens)
+        finally:
+            self._running(-1)
+        return FakeResponse(" ".join(self._words()), len(prompt) // 4, self.output_tokens)
+
+    def _stream(self, prompt):
+        words = self._words()
+        self._running(1)
+        try:
+            time.sleep(self.first_token_latency)
+            for i in range(0, len(words), self.chunk_tokens):
+                chunk = words[i:i + self.chunk_tokens]
+                time.sleep(self.token_latency * len(chunk))
+                yield FakeResponse(("" if i == 0 else " ") + " ".join(chunk), len(prompt) // 4, len(chunk))
+        finally:
+            self._running(-1)
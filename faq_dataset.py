@@ -0,0 +1,65 @@
+import math
+import warnings
+
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from augmentation import DEFAULT_RULE_SETS, augment_frame
+
+# Below this many held-out questions, accuracies and calibrated thresholds are mostly noise
+MIN_VALIDATION_QUESTIONS = 50
+
+
+# Function to pick the original questions held out for validation
+def heldout_mask(df, test_size=0.2, random_state=42):
+    """Marks about ``test_size`` of each label's questions for validation.
+
+    Every label keeps at least one question for training, so labels with a
+    single question are never held out.
+    """
+    shuffled = df.sample(frac=1, random_state=random_state)
+    rank = shuffled.groupby("labels").cumcount()
+    counts = shuffled.groupby("labels")["labels"].transform("size")
+    budget = counts.map(lambda count: min(count - 1, math.ceil(count * test_size)))
+    return (rank < budget).reindex(df.index)
+
+
+# Function to load, split, augment and encode the FAQ dataset
+def load_splits(data_path="clean_data.csv", rule_sets=DEFAULT_RULE_SETS, dedupe=False, chunksize=50_000, test_size=0.2):
+    """Returns the original dataset, the train/validation splits and the fitted label encoder.
+
+    Original questions are held out *before* augmentation and validated on
+    as written, so no rewrite of a validation question is ever trained on;
+    only the training split is doubled (see augmentation.py). Raises
+    ``ValueError`` when no label has a second question to hold out, and warns
+    when fewer than ``MIN_VALIDATION_QUESTIONS`` are held out.
+    """
+    # Ensure columns are `questions`, `answers`, `labels`
+    df = pd.read_csv(data_path)
+
+    # Encode labels
+    label_encoder = LabelEncoder()
+    df["label_encoded"] = label_encoder.fit_transform(df["labels"])
+
+    heldout = heldout_mask(df, test_size)
+    val_df = df[heldout].reset_index(drop=True)
+    if val_df.empty:
+        raise ValueError(
+            f"{data_path} has no label with more than one question, so no question can be held out for validation"
+        )
+    if len(val_df) < MIN_VALIDATION_QUESTIONS:
+        warnings.warn(
+            f"Only {len(val_df)} of {len(df)} questions held out for validation (labels with one question never are); "
+            f"accuracy and calibration on them are unreliable"
+        )
+    train_originals = df[~heldout]
+    # The split needs every label's question count, so the CSV is read whole; only the doubling of the
+    # training questions is chunked (augmentation.py streams a CSV to disk without loading it)
+    train_df = pd.concat(
+        [
+            augment_frame(train_originals.iloc[start:start + chunksize], rule_sets=rule_sets, dedupe=dedupe)
+            for start in range(0, len(train_originals), chunksize)
+        ],
+        ignore_index=True
+    )
+    return df, train_df, val_df, label_encoder
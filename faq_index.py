@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+DEFAULT_ENCODER = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDINGS_FILE = "embeddings.f32"
+ENTRIES_FILE = "entries.jsonl"
+META_FILE = "meta.json"
+
+
+# Sentence embeddings from any Hugging Face encoder (also the fine-tuned BERT directory)
+class SentenceEncoder:
+    """Embeds texts as L2-normalized float32 vectors, mean-pooled over their tokens."""
+
+    def __init__(self, model_name=DEFAULT_ENCODER, batch_size=64, max_length=128):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.torch = torch
+        self.name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # AutoModel drops the classification head when pointed at a BertForSequenceClassification directory
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def __call__(self, texts):
+        texts = list(texts)
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            inputs = self.tokenizer(texts[i:i + self.batch_size], truncation=True, padding=True,
+                                    max_length=self.max_length, return_tensors="pt")
+            with self.torch.inference_mode():
+                hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            vectors.append(((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).float().numpy())
+        if not vectors:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        return normalize(np.concatenate(vectors))
+
+
+# Function to scale vectors to unit length so a dot product is their cosine similarity
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# Nearest-neighbour answers over the FAQ questions, without a trained classifier head
+class FaqIndex:
+    """Answers a question with the FAQ entries whose questions are most similar to it.
+
+    The embeddings of all FAQ questions are stored back to back as float32 in
+    ``embeddings.f32`` and memory-mapped, so opening the index reads nothing
+    up front; ``entries.jsonl`` holds the question, answer and label of each
+    row in the same order. ``add()`` appends rows to both files, so new FAQ
+    entries are searchable without retraining or rebuilding. ``embed_fn``
+    takes a list of texts and returns one vector per text (e.g. a
+    ``SentenceEncoder``); ``encoder`` names it so an index is never queried
+    with vectors from a different model.
+    """
+
+    def __init__(self, index_dir, embed_fn, encoder=None):
+        with open(os.path.join(index_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if encoder is not None and encoder != meta["encoder"]:
+            raise ValueError(f"Index was built with {meta['encoder']!r} but is queried with {encoder!r}")
+        self.index_dir = index_dir
+        self.embed_fn = embed_fn
+        self.encoder = meta["encoder"]
+        self.dim = meta["dim"]
+        with open(os.path.join(index_dir, ENTRIES_FILE), "r", encoding="utf-8") as f:
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        self._map()
+
+    @classmethod
+    def build(cls, index_dir, questions, answers, labels, embed_fn, encoder, batch_size=1024):
+        """Embeds every FAQ question into a new index directory and returns the opened index."""
+        os.makedirs(index_dir, exist_ok=True)
+        questions = list(questions)
+        dim = None
+        # Embeddings are written batch by batch, so the whole matrix is never held in memory twice
+        with open(os.path.join(index_dir, EMBEDDINGS_FILE), "wb") as f:
+            for i in range(0, len(questions), batch_size):
+                vectors = normalize(embed_fn(questions[i:i + batch_size]))
+                dim = vectors.shape[1]
+                f.write(vectors.tobytes())
+        if dim is None:
+            dim = normalize(embed_fn(["?"])).shape[1]
+        with open(os.path.join(index_dir, ENTRIES_FILE), "w", encoding="utf-8") as f:
+            for question, answer, label in zip(questions, answers, labels):
+                f.write(json.dumps({"question": question, "answer": answer, "label": str(label)}, ensure_ascii=False) + "\n")
+        # meta.json is written last, so a half-built directory is never opened as an index
+        with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"encoder": encoder, "dim": dim}, f)
+        return cls(index_dir, embed_fn, encoder)
+
+    def _map(self):
+        rows = len(self.entries)
+        path = os.path.join(self.index_dir, EMBEDDINGS_FILE)
+        if rows == 0:
+            self.embeddings = np.zeros((0, self.dim), dtype=np.float32)
+        else:
+            self.embeddings = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, questions, answers, labels):
+        """Appends FAQ entries to the index; they are searchable as soon as this returns."""
+        questions = list(questions)
+        vectors = normalize(self.embed_fn(questions))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding size {vectors.shape[1]} does not match the index ({self.dim})")
+        new_entries = [
+            {"question": question, "answer": answer, "label": str(label)}
+            for question, answer, label in zip(questions, answers, labels)
+        ]
+        self.embeddings = None
+        with open(os.path.join(self.index_dir, EMBEDDINGS_FILE), "r+b") as f:
+            # Drop vectors left behind by an add that stopped before its entries were written
+            f.truncate(len(self.entries) * self.dim * 4)
+            f.seek(0, os.SEEK_END)
+            f.write(vectors.tobytes())
+        with open(os.path.join(self.index_dir, ENTRIES_FILE), "a", encoding="utf-8") as f:
+            for entry in new_entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.entries.extend(new_entries)
+        self._map()
+
+    def search(self, questions, k=5):
+        """Returns ``(scores, rows)``, both (questions x k), with the most similar entry first."""
+        return self.search_vectors(self.embed_fn(list(questions)), k)
+
+    def search_vectors(self, query_vectors, k=5):
+        """Top-k cosine search for already embedded questions."""
+        query_vectors = normalize(query_vectors)
+        k = min(k, len(self.entries))
+        if k == 0:
+            empty = np.zeros((len(query_vectors), 0))
+            return empty, empty.astype(np.int64)
+        # One matrix product scores every question against every entry
+        scores = query_vectors @ self.embeddings.T
+        rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, rows, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+    def predict_labels(self, questions, k=1):
+        """Returns the label of each question: the nearest entry's, or a similarity-weighted vote of the top k."""
+        scores, rows = self.search(questions, k)
+        labels = []
+        for row_scores, row_ids in zip(scores, rows):
+            votes = {}
+            for score, row in zip(row_scores, row_ids):
+                label = self.entries[row]["label"]
+                votes[label] = votes.get(label, 0.0) + float(score)
+            labels.append(max(votes, key=votes.get) if votes else None)
+        return labels
+
+    def answer(self, question, k=5):
+        """Returns the best entry's ``answer``, ``label``, ``score`` and matched ``question`` plus the top-k ``matches``."""
+        scores, rows = self.search([question], k)
+        matches = [dict(self.entries[row], score=float(score)) for score, row in zip(scores[0], rows[0])]
+        if not matches:
+            return None
+        return dict(matches[0], matches=matches)
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Build, extend and query the nearest-neighbour FAQ index.")
+    parser.add_argument("--index-dir", default="./faq_index")
+    parser.add_argument("--encoder", default=DEFAULT_ENCODER, help="Hugging Face encoder or fine-tuned model directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Embed every question of the FAQ dataset")
+    build.add_argument("--data", default="clean_data.csv")
+    build.add_argument("--augment", action="store_true", help="Also index the rewritten questions from augmentation.py")
+    add = commands.add_parser("add", help="Append FAQ entries from a CSV with questions, answers and labels columns")
+    add.add_argument("csv")
+    query = commands.add_parser("query", help="Answer a question from the index")
+    query.add_argument("question")
+    query.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    encoder = SentenceEncoder(args.encoder)
+    if args.command == "build":
+        if args.augment:
+            from augmentation import augment_csv
+            df = pd.concat(augment_csv(args.data), ignore_index=True)
+        else:
+            df = pd.read_csv(args.data)
+        index = FaqIndex.build(args.index_dir, df["questions"], df["answers"], df["labels"], encoder, args.encoder)
+        print(f"Indexed {len(index)} questions ({index.dim} dimensions) in {args.index_dir}")
+    elif args.command == "add":
+        df = pd.read_csv(args.csv)
+        index = FaqIndex(args.index_dir, encoder, args.encoder)
+        index.add(df["questions"], df["answers"], df["labels"])
+        print(f"Added {len(df)} questions; the index now holds {len(index)}")
+    else:
+        result = FaqIndex(args.index_dir, encoder, args.encoder).answer(args.question, k=args.k)
+        if result is None:
+            print("The index is empty")
+            return
+        print(f"Answer: {result['answer']}")
+        for match in result["matches"]:
+            print(f"  {match['score']:.3f}  [{match['label']}] {match['question']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+
+# Function to recognise a rate-limit error from Gemini (HTTP 429 / ResourceExhausted) or the local fake
+def is_rate_limited(error):
+    return getattr(error, "code", None) == 429 or type(error).__name__ == "ResourceExhausted"
+
+
+# Process-wide front door for Gemini calls
+class GeminiDispatcher:
+    """Shares one Gemini model between all sessions.
+
+    Identical prompts that are already in flight wait for that call instead
+    of starting their own. At most ``max_concurrency`` calls run at once and
+    the rest queue for a slot. Rate-limit errors are retried with jittered
+    exponential backoff; other errors are raised to every waiting caller.
+    ``model`` is a ``genai.GenerativeModel`` or a local fake.
+    """
+
+    def __init__(self, model, max_concurrency=4, max_retries=4, backoff_base=1.0, sleep=time.sleep):
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.sleep = sleep
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.counters = {"waiting": 0, "active": 0, "calls": 0, "coalesced": 0, "rate_limited": 0, "failures": 0}
+
+    def stats(self):
+        """Returns the queue depth (``waiting``), running calls and call counters."""
+        with self.lock:
+            return dict(self.counters)
+
+    def _count(self, name, delta=1):
+        with self.lock:
+            self.counters[name] += delta
+
+    @contextmanager
+    def _slot(self):
+        self._count("waiting")
+        self.slots.acquire()
+        with self.lock:
+            self.counters["waiting"] -= 1
+            self.counters["active"] += 1
+        try:
+            yield
+        finally:
+            self._count("active", -1)
+            self.slots.release()
+
+    def _backoff(self, attempt, error):
+        self._count("rate_limited")
+        delay = self.backoff_base * (2 ** attempt)
+        print(f"Gemini rate limited (attempt {attempt + 1}): {error}")
+        self.sleep(delay + random.uniform(0, delay))
+
+    def _join(self, prompt):
+        """Returns the future for a prompt and whether this caller has to make the call."""
+        with self.lock:
+            future = self.inflight.get(prompt)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                return future, False
+            future = self.inflight[prompt] = Future()
+            return future, True
+
+    def _finish(self, prompt):
+        with self.lock:
+            self.inflight.pop(prompt, None)
+
+    def generate(self, prompt):
+        """Returns Gemini's response for a prompt, sharing the call with identical in-flight prompts."""
+        future, leader = self._join(prompt)
+        if not leader:
+            return future.result()
+        try:
+            with self._slot():
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        self._count("calls")
+                        future.set_result(self.model.generate_content(prompt))
+                        break
+                    except Exception as e:
+                        if not is_rate_limited(e) or attempt == self.max_retries:
+                            raise
+                        self._backoff(attempt, e)
+        except Exception as e:
+            self._count("failures")
+            future.set_exception(e)
+        finally:
+            self._finish(prompt)
+        return future.result()
+
+    def stream(self, prompt):
+        """Yields response chunks as Gemini generates them.
+
+        A caller whose prompt is already being answered gets the finished
+        answer as a single chunk. Rate limits are only retried before the
+        first chunk has arrived.
+        """
+        future, leader = self._join(prompt)
+        if not leader:
+            yield future.result()
+            return
+        parts = []
+        last_chunk = None
+        try:
+            with self._slot():
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        self._count("calls")
+                        for chunk in self.model.generate_content(prompt, stream=True):
+                            last_chunk = chunk
+                            try:
+                                parts.append(chunk.text)
+                            except ValueError:
+                                pass
+                            yield chunk
+                        break
+                    except Exception as e:
+                        if last_chunk is not None or not is_rate_limited(e) or attempt == self.max_retries:
+                            raise
+                        self._backoff(attempt, e)
+            future.set_result(SimpleNamespace(text="".join(parts), usage_metadata=getattr(last_chunk, "usage_metadata", None)))
+        except Exception as e:
+            self._count("failures")
+            future.set_exception(e)
+            raise
+        finally:
+            if not future.done():
+                # The caller stopped reading the stream; waiting callers must not hang
+                future.set_exception(RuntimeError("Gemini stream was abandoned"))
+            self._finish(prompt)
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+THRESHOLDS_FILE = "router_thresholds.json"
+DEFAULT_THRESHOLDS = {"confidence": 0.9, "margin": 0.3}
+
+# Questions the FAQ cannot answer, used to teach the thresholds to reject what the classifier never saw
+OUT_OF_SCOPE_QUESTIONS = [
+    "What is the weather like today?",
+    "Who won the cricket match yesterday?",
+    "Can you recommend a good restaurant near the branch?",
+    "How do I reset my email password?",
+    "Write a poem about the monsoon.",
+    "What is the capital of Australia?",
+    "Which stocks should I buy this week?",
+    "What is the interest rate on a fixed deposit?",
+    "How do I apply for a credit card?",
+    "What is the current repo rate set by the RBI?",
+    "How do I open a savings account?",
+    "What are the charges for a demand draft?",
+    "Can I get a car loan from MS Fincap?",
+    "How do I file my income tax return?",
+    "What is the exchange rate for US dollars?",
+    "When is the office closed for Diwali?",
+    "How many leaves do employees get per year?",
+    "Tell me a joke.",
+]
+
+
+# Function to turn class probabilities into a routing decision's confidence and margin
+def confidence_and_margin(probabilities):
+    """Returns the best class index, its probability and the gap to the runner-up."""
+    ranked = sorted(range(len(probabilities)), key=lambda i: probabilities[i], reverse=True)
+    best = ranked[0]
+    runner_up = probabilities[ranked[1]] if len(ranked) > 1 else 0.0
+    return best, probabilities[best], probabilities[best] - runner_up
+
+
+# Confidence-gated router between the BERT classifier and Gemini
+class HybridRouter:
+    """Decides whether the classifier's canned answer can be used or the question goes to the LLM.
+
+    ``classify_fn(question)`` returns the class probabilities and
+    ``answer_fn(label_idx)`` the canned answer for a class. The caller
+    answers rejected questions itself (the chat app streams them from
+    Gemini) and reports every routed question with ``record()``, which
+    counts it per route and appends it to ``log_path``.
+    """
+
+    def __init__(self, classify_fn, answer_fn, confidence_threshold=DEFAULT_THRESHOLDS["confidence"],
+                 margin_threshold=DEFAULT_THRESHOLDS["margin"], log_path="router_log.jsonl"):
+        self.classify_fn = classify_fn
+        self.answer_fn = answer_fn
+        self.confidence_threshold = confidence_threshold
+        self.margin_threshold = margin_threshold
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.counts = {"classifier": 0, "llm": 0}
+        self.total_seconds = {"classifier": 0.0, "llm": 0.0}
+
+    def classify(self, question):
+        """Runs the classifier and decides whether its answer can be used."""
+        start = time.perf_counter()
+        label_idx, confidence, margin = confidence_and_margin(list(self.classify_fn(question)))
+        accepted = confidence >= self.confidence_threshold and margin >= self.margin_threshold
+        return {
+            "label_idx": label_idx,
+            "confidence": confidence,
+            "margin": margin,
+            "accepted": accepted,
+            "answer": self.answer_fn(label_idx) if accepted else None,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def record(self, question, route, seconds, decision):
+        """Counts a routed question and appends it to the routing log."""
+        with self.lock:
+            self.counts[route] += 1
+            self.total_seconds[route] += seconds
+        if not self.log_path:
+            return
+        entry = {
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "question": question,
+            "route": route,
+            "seconds": round(seconds, 4),
+            "confidence": round(decision["confidence"], 4),
+            "margin": round(decision["margin"], 4),
+        }
+        try:
+            with self.lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Error writing router log: {e}")
+
+    def stats(self):
+        """Returns per-route counts, mean latency and the share of questions kept off the LLM."""
+        with self.lock:
+            total = sum(self.counts.values())
+            return {
+                "total": total,
+                "classifier_rate": self.counts["classifier"] / total if total else 0.0,
+                "counts": dict(self.counts),
+                "mean_seconds": {
+                    route: self.total_seconds[route] / count if count else 0.0
+                    for route, count in self.counts.items()
+                },
+            }
+
+
+# Function to pick thresholds from validation predictions
+def calibrate_thresholds(probabilities, labels, target_accuracy=0.95):
+    """Finds the thresholds that send the most questions to the classifier at the target accuracy.
+
+    ``probabilities`` holds one list of class probabilities per validation
+    question and ``labels`` the true class indices, with -1 for out-of-scope
+    questions (accepting one of those is always an error). Returns a dict
+    with the ``confidence`` and ``margin`` thresholds, the resulting
+    ``coverage`` (share of in-scope questions answered by the classifier),
+    the ``accuracy`` on everything accepted and ``out_of_scope_accepted``
+    (share of out-of-scope questions wrongly accepted). Raises ``ValueError``
+    without in-scope questions, as any thresholds would be meaningless.
+    """
+    decisions = [confidence_and_margin(list(row)) + (label,) for row, label in zip(probabilities, labels)]
+    in_scope = sum(label >= 0 for label in labels)
+    if not in_scope:
+        raise ValueError("No in-scope validation questions to calibrate the thresholds on")
+    out_of_scope = len(decisions) - in_scope
+    best = {"confidence": 1.01, "margin": 1.01, "coverage": 0.0, "accuracy": 1.0, "out_of_scope_accepted": 0.0}
+    for confidence_step in range(30, 100):
+        confidence_threshold = confidence_step / 100
+        for margin_step in range(0, 100, 5):
+            margin_threshold = margin_step / 100
+            accepted = [
+                (predicted == label, label >= 0) for predicted, confidence, margin, label in decisions
+                if confidence >= confidence_threshold and margin >= margin_threshold
+            ]
+            if not accepted:
+                continue
+            accuracy = sum(correct for correct, _ in accepted) / len(accepted)
+            coverage = sum(known for _, known in accepted) / in_scope if in_scope else 0.0
+            if accuracy >= target_accuracy and coverage > best["coverage"]:
+                wrongly_accepted = sum(not known for _, known in accepted)
+                best = {"confidence": confidence_threshold, "margin": margin_threshold,
+                        "coverage": coverage, "accuracy": accuracy,
+                        "out_of_scope_accepted": wrongly_accepted / out_of_scope if out_of_scope else 0.0}
+    return best
+
+
+# Function to read the calibrated thresholds saved with the model
+def load_thresholds(model_dir):
+    """Returns the router thresholds saved in a model directory, or the defaults."""
+    path = os.path.join(model_dir, THRESHOLDS_FILE)
+    if not os.path.exists(path):
+        return dict(DEFAULT_THRESHOLDS)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    from transformers import BertTokenizer
+
+    from bert_inference import BACKENDS, load_classifier, predict_probabilities
+    from faq_dataset import load_splits
+
+    parser = argparse.ArgumentParser(
+        description="Calibrate the classifier/Gemini routing thresholds on held-out FAQ questions and out-of-scope questions."
+    )
+    parser.add_argument("--model-dir", default="./bert_chatbot_model")
+    parser.add_argument("--data", default="clean_data.csv")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--target-accuracy", type=float, default=0.95)
+    parser.add_argument("--negatives", help="Text file with more out-of-scope questions, one per line")
+    args = parser.parse_args()
+
+    # The validation split is original questions held out before augmentation, which the model never saw
+    _, _, val_df, _ = load_splits(args.data)
+    negatives = list(OUT_OF_SCOPE_QUESTIONS)
+    if args.negatives:
+        with open(args.negatives, "r", encoding="utf-8") as f:
+            negatives.extend(line.strip() for line in f if line.strip())
+    tokenizer = BertTokenizer.from_pretrained(args.model_dir)
+    model = load_classifier(args.model_dir, backend=args.backend)
+    questions = list(val_df["questions"]) + negatives
+    probabilities = []
+    for i in range(0, len(questions), 32):
+        probabilities.extend(predict_probabilities(questions[i:i + 32], model, tokenizer).tolist())
+
+    labels = list(val_df["label_encoded"]) + [-1] * len(negatives)
+    thresholds = calibrate_thresholds(probabilities, labels, args.target_accuracy)
+    with open(os.path.join(args.model_dir, THRESHOLDS_FILE), "w", encoding="utf-8") as f:
+        json.dump(thresholds, f, indent=2)
+    print(
+        f"confidence >= {thresholds['confidence']:.2f}, margin >= {thresholds['margin']:.2f}: "
+        f"{thresholds['coverage']:.1%} of {len(val_df)} held-out FAQ questions answered by the classifier at "
+        f"{thresholds['accuracy']:.1%} accuracy, {thresholds['out_of_scope_accepted']:.1%} of {len(negatives)} "
+        f"out-of-scope questions wrongly accepted"
+    )
+
+
+if __name__ == "__main__":
+    main()
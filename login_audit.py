@@ -0,0 +1,126 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+# Marker put on the queue to ask the writer thread to flush and exit
+STOP = object()
+
+
+# Background writer that batches login records into the Google Sheet
+class LoginAuditWriter:
+    """Queues login records and appends them to the worksheet in batches.
+
+    ``open_worksheet`` is called from the writer thread to get the worksheet
+    (a gspread worksheet or a local fake) and is called again after a failure.
+    Failed batches are retried with exponential backoff and, when the sheet
+    stays unavailable, spilled to a local JSONL file that is replayed on the
+    next successful write.
+    """
+
+    def __init__(self, open_worksheet, batch_size=50, flush_interval=2.0, max_retries=4,
+                 backoff_base=1.0, spill_path="login_spill.jsonl"):
+        self.open_worksheet = open_worksheet
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.spill_path = spill_path
+        self.sleep = time.sleep
+        self.queue = queue.Queue()
+        self.worksheet = None
+        self.thread = None
+        self.written = 0
+        self.spilled = 0
+        self.spill_lock = threading.Lock()
+
+    def start(self):
+        """Starts the background writer thread."""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="login-audit-writer", daemon=True)
+            self.thread.start()
+        return self
+
+    def submit(self, record):
+        """Queues a login record (a list of cell values) without waiting on the network."""
+        self.queue.put(list(record))
+
+    def stop(self, timeout=10.0):
+        """Flushes queued records and stops the writer thread."""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(STOP)
+            self.thread.join(timeout)
+
+    def pending(self):
+        """Returns the number of queued and spilled records not yet written to the sheet."""
+        return self.queue.qsize() + len(self._read_spill())
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            while item is not None:
+                if item is STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if batch or os.path.exists(self.spill_path):
+                self.flush(batch)
+
+    def flush(self, rows):
+        """Writes spilled and new rows in one batch, spilling them to disk if the sheet is unavailable."""
+        with self.spill_lock:
+            spilled_rows = self._read_spill()
+            rows = spilled_rows + rows
+            if not rows:
+                return True
+            if self._append_with_retries(rows):
+                if spilled_rows:
+                    os.remove(self.spill_path)
+                    print(f"Replayed {len(spilled_rows)} spilled login records")
+                self.written += len(rows)
+                return True
+            self._write_spill(rows)
+            self.spilled += len(rows) - len(spilled_rows)
+            print(f"Sheets unavailable, spilled {len(rows)} login records to {self.spill_path}")
+            return False
+
+    def _append_with_retries(self, rows):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.worksheet is None:
+                    self.worksheet = self.open_worksheet()
+                self.worksheet.append_rows(rows, value_input_option="USER_ENTERED")
+                return True
+            except Exception as e:
+                print(f"Error saving login records (attempt {attempt + 1}): {e}")
+                self.worksheet = None
+                if attempt < self.max_retries:
+                    delay = self.backoff_base * (2 ** attempt)
+                    self.sleep(delay + random.uniform(0, delay))
+        return False
+
+    def _read_spill(self):
+        if not os.path.exists(self.spill_path):
+            return []
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _write_spill(self, rows):
+        temp_path = self.spill_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.spill_path)
@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+import time
+
+# Row 1 of the login sheet holds the column headers, as get_all_records expects
+FIRST_DATA_ROW = 2
+COLUMNS = ["Name", "Employee_ID", "Login_Time"]
+
+
+# Local SQLite mirror of the login records sheet
+class LoginMirror:
+    """Keeps a local copy of the login sheet and syncs only rows added since the last sync.
+
+    Queries run against the mirror. ``freshness_seconds`` controls how long a
+    sync is trusted before the next call to ``sync`` goes back to the sheet.
+    """
+
+    def __init__(self, path="login_mirror.sqlite3", freshness_seconds=60):
+        self.path = path
+        self.freshness_seconds = freshness_seconds
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS logins (
+                row_index INTEGER PRIMARY KEY,
+                name TEXT,
+                employee_id TEXT,
+                login_time TEXT
+            );
+            CREATE INDEX IF NOT EXISTS logins_employee ON logins (employee_id);
+            CREATE INDEX IF NOT EXISTS logins_time ON logins (login_time);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            );
+            """
+        )
+        self.connection.commit()
+
+    def _state(self, key, default):
+        row = self.connection.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def last_row(self):
+        """Returns the sheet row index of the last mirrored row."""
+        with self.lock:
+            return int(self._state("last_row", FIRST_DATA_ROW - 1))
+
+    def is_fresh(self):
+        """Returns True while the last sync is within the freshness window."""
+        with self.lock:
+            last_synced = self._state("last_synced", 0.0)
+        return time.time() - last_synced < self.freshness_seconds
+
+    def sync(self, worksheet, force=False):
+        """Copies rows added to the sheet since the last sync and returns how many were added."""
+        with self.lock:
+            if not force and time.time() - self._state("last_synced", 0.0) < self.freshness_seconds:
+                return 0
+            start = int(self._state("last_row", FIRST_DATA_ROW - 1)) + 1
+            rows = worksheet.get_values(f"A{start}:C")
+
+            new_rows = []
+            for offset, row in enumerate(rows):
+                values = (list(row) + [""] * len(COLUMNS))[:len(COLUMNS)]
+                if any(values):
+                    new_rows.append([start + offset] + values)
+            self.connection.executemany("INSERT OR REPLACE INTO logins VALUES (?, ?, ?, ?)", new_rows)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES ('last_row', ?)", (start + len(rows) - 1,)
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES ('last_synced', ?)", (time.time(),)
+            )
+            self.connection.commit()
+        if new_rows:
+            print(f"Login mirror: synced {len(new_rows)} new rows")
+        return len(new_rows)
+
+    def reset(self):
+        """Clears the mirror so the next sync copies the whole sheet again."""
+        with self.lock:
+            self.connection.execute("DELETE FROM logins")
+            self.connection.execute("DELETE FROM sync_state")
+            self.connection.commit()
+
+    def records(self):
+        """Returns all mirrored login records as ``[name, employee_id, login_time]`` rows."""
+        with self.lock:
+            return [list(row) for row in self.connection.execute(
+                "SELECT name, employee_id, login_time FROM logins ORDER BY row_index"
+            )]
+
+    def logins_per_employee(self):
+        """Returns ``(employee_id, name, login_count)`` rows, most active employees first."""
+        with self.lock:
+            return self.connection.execute(
+                """
+                SELECT employee_id, MAX(name), COUNT(*) AS logins FROM logins
+                GROUP BY employee_id ORDER BY logins DESC, employee_id
+                """
+            ).fetchall()
+
+    def logins_per_day(self):
+        """Returns ``(date, login_count)`` rows in date order."""
+        with self.lock:
+            return self.connection.execute(
+                """
+                SELECT substr(login_time, 1, 10) AS day, COUNT(*) FROM logins
+                GROUP BY day ORDER BY day
+                """
+            ).fetchall()
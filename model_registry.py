@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from transformers import BertTokenizer
+
+from bert_inference import LabelIndex, MicroBatcher, load_classifier, predict_label_indices
+
+
+# Function to fingerprint the files of a model directory
+def directory_fingerprint(model_dir):
+    """Returns ``(name, size, mtime_ns)`` for every file in the directory, sorted by name."""
+    entries = []
+    with os.scandir(model_dir) as scan:
+        for entry in scan:
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return tuple(sorted(entries))
+
+
+# One copy of the classifier per process, shared read-only by every session
+class ModelRegistry:
+    """Loads the tokenizer, classifier, label index and inference server of a model directory once.
+
+    ``get()`` returns the loaded bundle and, at most every ``check_interval``
+    seconds, checks whether the files in ``model_dir`` changed. A changed
+    directory is reloaded once its files have been left alone for
+    ``settle_seconds`` (so a model that is still being written is not picked
+    up half way). The new bundle is loaded on a background thread and
+    swapped in under the lock, so sessions keep using the previous bundle
+    until it is ready and no request waits for a reload; a failed reload
+    keeps the previous bundle.
+    """
+
+    def __init__(self, model_dir, backend="torch", check_interval=5.0, settle_seconds=2.0):
+        self.model_dir = model_dir
+        self.backend = backend
+        self.check_interval = check_interval
+        self.settle_seconds = settle_seconds
+        self.lock = threading.Lock()
+        self.bundle = None
+        self.fingerprint = None
+        self.last_check = 0.0
+        self.loads = 0
+        self.reloading = False
+
+    def _load(self):
+        start = time.perf_counter()
+        tokenizer = BertTokenizer.from_pretrained(self.model_dir)
+        # from_pretrained reads model.safetensors through a memory map when the directory has one
+        model = load_classifier(self.model_dir, backend=self.backend)
+        label_index = LabelIndex.load(self.model_dir)
+        label_index.check_model(model)
+        server = MicroBatcher(
+            lambda questions: predict_label_indices(questions, model, tokenizer),
+            max_batch_size=16,
+            max_wait_ms=10
+        ).start()
+        self.loads += 1
+        return SimpleNamespace(
+            tokenizer=tokenizer,
+            model=model,
+            label_index=label_index,
+            server=server,
+            version=self.loads,
+            load_seconds=time.perf_counter() - start,
+        )
+
+    def get(self):
+        """Returns the current bundle (``tokenizer``, ``model``, ``label_index``, ``server``, ``version``, ``load_seconds``)."""
+        now = time.monotonic()
+        if self.bundle is not None and now - self.last_check < self.check_interval:
+            return self.bundle
+        with self.lock:
+            if self.bundle is not None and now - self.last_check < self.check_interval:
+                return self.bundle
+            self.last_check = now
+            fingerprint = directory_fingerprint(self.model_dir)
+            if self.bundle is None:
+                self.bundle = self._load()
+                self.fingerprint = fingerprint
+            elif fingerprint != self.fingerprint and not self.reloading:
+                newest = max((mtime_ns for _, _, mtime_ns in fingerprint), default=0) / 1e9
+                if time.time() - newest >= self.settle_seconds:
+                    # Recorded now, so a change made while loading triggers another reload afterwards
+                    self.fingerprint = fingerprint
+                    self.reloading = True
+                    threading.Thread(target=self._reload, daemon=True).start()
+            return self.bundle
+
+    def _reload(self):
+        try:
+            bundle = self._load()
+        except Exception as e:
+            print(f"Reloading {self.model_dir} failed, keeping model v{self.bundle.version}: {e}")
+            with self.lock:
+                self.reloading = False
+            return
+        with self.lock:
+            old_server = self.bundle.server
+            self.bundle = bundle
+            self.reloading = False
+        print(f"Reloaded {self.model_dir} as model v{bundle.version} in {bundle.load_seconds:.2f}s")
+        # Sessions that fetched the old bundle a moment ago may still submit to its server
+        threading.Timer(30, old_server.stop).start()
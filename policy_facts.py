@@ -0,0 +1,233 @@
+import re
+
+from policy_retrieval import HEADING_PATTERN, clean_heading, split_table_row, tokenize
+
+# Alternative names staff use for the loan products in the policy table
+PRODUCT_ALIASES = {
+    "Loan Against Property": ["loan against property", "lap", "mortgage loan"],
+    "Agri Gift Deed Cases": ["agri gift deed", "agri", "agriculture", "gift deed"],
+    "GP Property": ["gp property", "gp", "gram panchayat"],
+    "Above GP Property": ["above gp"],
+}
+
+# Intents answered from the policy tables; each maps to the keywords that trigger it
+PRODUCT_INTENTS = {
+    "roi": ["roi", "interest", "rate of interest", "interest rate", "rate"],
+    "tenure": ["tenure", "tenor", "loan period", "repayment period", "duration"],
+    "amount": ["amount", "loan size", "ticket size", "how much loan", "maximum loan", "minimum loan"],
+}
+SCALAR_INTENTS = {
+    "radius": (["distance", "radius", "km", "kilometer", "far from"], "distance"),
+    "cibil": (["cibil", "credit score", "bureau score"], "cibil score"),
+    "ltv": (["ltv", "loan to value", "loan-to-value"], "loan-to-value"),
+    "foir": (["foir", "fixed obligation"], "foir"),
+    "min_income": (["minimum income", "min income", "income requirement", "minimum salary"], "minimum income"),
+}
+
+# Questions with these words need reasoning, so they always go to Gemini
+OPEN_ENDED_WORDS = ["why", "explain", "compare", "difference", "should", "eligible", "if i", "can i", "my ", "calculate", "emi"]
+MAX_LOOKUP_WORDS = 14
+
+# Yes/no questions ask about a condition the tables do not state, so they also go to Gemini
+YES_NO_OPENERS = {"is", "are", "does", "do", "did", "can", "could", "will", "would", "has", "have", "was", "were", "should", "must"}
+
+# Words a lookup may contain besides its intent and product; any other word means the question asks about something else
+LOOKUP_WORDS = {
+    "maximum", "minimum", "max", "min", "limit", "limits", "loan", "loans", "policy", "current", "applicable",
+    "allowed", "required", "requirement", "value", "range", "customer", "customers", "borrower", "borrowers",
+    "company", "long", "many", "percent", "percentage", "charged", "offered", "given", "give", "get", "need",
+    "branch",
+}
+
+KEY_VALUE_PATTERN = re.compile(r"^[-*\s]*([A-Za-z][^:]{2,60}):\s*(.+)$")
+MIN_INCOME_PATTERN = re.compile(r"minimum (?:total )?income of (₹[\d,]+ per month)", re.IGNORECASE)
+
+
+# Function to check that a product table cell holds the kind of value its column is for
+def valid_product_cell(column, value):
+    """Returns False for a value that belongs in another column, e.g. an interest rate under Amount Range."""
+    value = value.replace("**", "").strip().lower()
+    if value in ("", "-"):
+        return True
+    if column == "amount":
+        return "%" not in value or "₹" in value or "lakh" in value
+    if column == "roi":
+        return "%" in value
+    if column == "tenure":
+        return "year" in value or "month" in value
+    return True
+
+
+# Function to check whether a keyword appears as a whole word or phrase
+def contains_phrase(text, phrase):
+    """Returns True when the phrase appears in the text on word boundaries."""
+    return re.search(rf"(?<!\w){re.escape(phrase)}(?!\w)", text) is not None
+
+
+# Structured facts parsed from the credit policy markdown
+class PolicyFacts:
+    """Loan products, fees, age limits and single-value rules from the policy tables and bullets."""
+
+    def __init__(self, products, fees, borrower_ages, scalars):
+        self.products = products
+        self.fees = fees
+        self.borrower_ages = borrower_ages
+        self.scalars = scalars
+
+    @classmethod
+    def from_markdown(cls, markdown_text):
+        """Parses the policy markdown into a fact store."""
+        tables = {}
+        scalars = {}
+        heading = ""
+        table_header = None
+
+        for raw_line in markdown_text.splitlines():
+            line = raw_line.strip()
+            heading_match = HEADING_PATTERN.match(line)
+            if heading_match:
+                heading = clean_heading(heading_match.group(2)).lower()
+                table_header = None
+                continue
+
+            if line.startswith("|"):
+                cells = split_table_row(line)
+                if not cells or all(set(cell) <= set("-: ") for cell in cells):
+                    continue
+                if table_header is None:
+                    table_header = cells
+                    tables.setdefault(heading, [])
+                    continue
+                tables[heading].append(dict(zip(table_header, cells)))
+                continue
+            table_header = None
+
+            plain = line.replace("**", "")
+            income_match = MIN_INCOME_PATTERN.search(plain)
+            if income_match:
+                scalars["minimum income"] = ("Minimum Income", income_match.group(1))
+            key_value = KEY_VALUE_PATTERN.match(plain)
+            if key_value and key_value.group(2).strip():
+                label = key_value.group(1).strip()
+                scalars[label.lower()] = (label, key_value.group(2).strip())
+
+        products = {}
+        fees = {}
+        borrower_ages = {}
+        for table_heading, rows in tables.items():
+            for row in rows:
+                values = list(row.values())
+                if "loan products" in table_heading and "Loan Type" in row:
+                    product = {
+                        "amount": row.get("Amount Range", "-"),
+                        "tenure": row.get("Tenure", "-"),
+                        "roi": row.get("Interest Rate (ROI)", "-"),
+                    }
+                    # A row with values in the wrong columns would give wrong answers, so it is left out
+                    if all(valid_product_cell(column, value) for column, value in product.items()):
+                        products[row["Loan Type"]] = product
+                elif "fees" in table_heading and len(values) >= 2:
+                    fees[values[0]] = values[1]
+                elif "individual borrowers" in table_heading and "Category" in row:
+                    borrower_ages[row["Category"]] = row
+        return cls(products, fees, borrower_ages, scalars)
+
+    def scalar(self, label_fragment):
+        """Returns ``(label, value)`` for the first single-value rule whose label contains the fragment."""
+        for key, label_and_value in self.scalars.items():
+            if label_fragment in key:
+                return label_and_value
+        return None
+
+    def matching_intents(self, text):
+        """Returns every intent the normalized question mentions.
+
+        Each match is a dict with the ``intent``, its ``answer`` (None when
+        the tables have no value for it) and the question ``words`` it explains.
+        """
+        matches = []
+
+        fee_words = {"fee", "fees", "charge", "charges"}
+        if "processing fee" in text or contains_phrase(text, "pf"):
+            fee = next((value for name, value in self.fees.items() if "processing" in name.lower()), None)
+            matches.append({
+                "intent": "processing_fee",
+                "answer": f"Processing Fee (PF): {fee}." if fee else None,
+                "words": fee_words | {"processing", "pf"},
+            })
+        else:
+            for name, value in self.fees.items():
+                name_words = [word for word in re.findall(r"[a-z]+", name.lower()) if word not in ("fee", "and")]
+                if name_words and contains_phrase(text, name_words[0]):
+                    matches.append({"intent": "fee", "answer": f"{name}: {value}.", "words": fee_words | set(name_words)})
+                    break
+
+        for intent, (keywords, label) in SCALAR_INTENTS.items():
+            if any(contains_phrase(text, keyword) for keyword in keywords):
+                fact = self.scalar(label)
+                matches.append({
+                    "intent": intent,
+                    "answer": f"{fact[0]}: {fact[1]}." if fact else None,
+                    "words": set(tokenize(" ".join(keywords) + " " + label)),
+                })
+
+        if "age" in text.split():
+            lines = [
+                f"- {category}: {row.get('Min Age (Loan Application)', '-')} at application, "
+                f"up to {row.get('Max Age (Loan Maturity)', '-')} at loan maturity"
+                for category, row in self.borrower_ages.items()
+            ]
+            matches.append({
+                "intent": "age",
+                "answer": "Borrower age limits:\n" + "\n".join(lines) if lines else None,
+                "words": {"age", "old"},
+            })
+
+        matched = [
+            product for product, aliases in PRODUCT_ALIASES.items()
+            if any(contains_phrase(text, alias) for alias in aliases)
+        ]
+        # "above gp" also contains "gp", so keep only the most specific product
+        if "Above GP Property" in matched:
+            matched = ["Above GP Property"]
+        product_words = set(tokenize(" ".join(matched + [alias for product in matched for alias in PRODUCT_ALIASES[product]])))
+        for intent, keywords in PRODUCT_INTENTS.items():
+            if not any(contains_phrase(text, keyword) for keyword in keywords):
+                continue
+            products = matched or [product for product in self.products if self.products[product][intent] != "-"]
+            label = {"roi": "Interest rate (ROI)", "tenure": "Tenure", "amount": "Loan amount"}[intent]
+            # A product the tables hold no valid row for is left to Gemini
+            if any(product not in self.products for product in products):
+                answer = None
+            elif len(products) == 1:
+                value = self.products[products[0]][intent]
+                answer = None if value == "-" else f"{label} for {products[0]}: {value}."
+            else:
+                lines = [f"- {product}: {self.products[product][intent]}" for product in products]
+                answer = f"{label} by loan product:\n" + "\n".join(lines)
+            matches.append({"intent": intent, "answer": answer, "words": set(tokenize(" ".join(keywords))) | product_words})
+
+        return matches
+
+    def answer(self, question):
+        """Answers a pure policy lookup locally, or returns None when Gemini is needed.
+
+        Only questions about exactly one intent, with no other subject and not
+        phrased as yes/no, are answered here. The result is a dict with the
+        ``answer`` text and the matched ``intent``.
+        """
+        text = " ".join(question.lower().replace("?", " ").split())
+        words = text.split()
+        if not words or len(words) > MAX_LOOKUP_WORDS or any(word in text + " " for word in OPEN_ENDED_WORDS):
+            return None
+        if words[0] in YES_NO_OPENERS:
+            return None
+
+        matches = self.matching_intents(text)
+        if len(matches) != 1 or matches[0]["answer"] is None:
+            return None
+        match = matches[0]
+        # "amount of insurance" matches the loan amount intent but asks about insurance
+        if any(word not in match["words"] and word not in LOOKUP_WORDS for word in tokenize(text)):
+            return None
+        return {"intent": match["intent"], "answer": match["answer"]}
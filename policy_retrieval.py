@@ -0,0 +1,208 @@
+import math
+import re
+from collections import Counter
+
+# Words that carry no signal for matching a question to a policy section
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "in", "is", "it", "me", "much", "of", "on", "or", "our", "please",
+    "should", "tell", "the", "there", "this", "to", "we", "what", "when", "which", "who",
+    "why", "will", "with", "you", "your",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s*(.*)$")
+
+
+# Function to estimate the number of LLM tokens in a piece of text
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) used for prompt budgeting."""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+# Function to split text into lowercase search terms
+def tokenize(text):
+    """Lowercases text and returns its search terms without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+# Function to strip markdown decoration and emojis from a heading
+def clean_heading(heading):
+    """Returns a heading without markdown emphasis, emojis or stray punctuation."""
+    heading = heading.replace("**", "").replace("__", "")
+    heading = "".join(char for char in heading if char.isascii())
+    return " ".join(heading.split()).strip(" -:")
+
+
+# Function to split a markdown table row into cells
+def split_table_row(line):
+    """Returns the cells of a markdown table row with emphasis removed."""
+    cells = [cell.replace("**", "").strip() for cell in line.strip().strip("|").split("|")]
+    return [cell for cell in cells if cell]
+
+
+# Function to split the credit policy markdown into searchable sections
+def parse_policy_sections(markdown_text):
+    """Splits policy markdown into heading sections and individual table rows.
+
+    Every section is a dict with ``id``, ``title`` (the heading path), ``kind``
+    (``"section"`` or ``"table_row"``) and ``text``. Table rows repeat the table
+    header so each row can be sent to the model on its own.
+    """
+    sections = []
+    heading_path = []
+    body_lines = []
+    table_header = None
+
+    def title():
+        # The top-level heading is the document title, so it only names sections that sit directly under it
+        nested = [heading for heading in heading_path[1:] if heading]
+        return " > ".join(nested) or (heading_path[0] if heading_path else "Policy")
+
+    def flush_body():
+        text = "\n".join(body_lines).strip()
+        if text:
+            sections.append({"id": len(sections), "title": title(), "kind": "section", "text": text})
+        body_lines.clear()
+
+    for raw_line in markdown_text.splitlines():
+        line = raw_line.strip()
+        heading_match = HEADING_PATTERN.match(line)
+        if heading_match:
+            flush_body()
+            table_header = None
+            level = len(heading_match.group(1))
+            heading_path[level - 1:] = [clean_heading(heading_match.group(2))]
+            continue
+
+        if line.startswith("|"):
+            cells = split_table_row(line)
+            if not cells or all(set(cell) <= set("-: ") for cell in cells):
+                continue
+            if table_header is None:
+                table_header = cells
+                continue
+            row_text = "; ".join(
+                f"{header}: {value}" for header, value in zip(table_header, cells)
+            )
+            sections.append({"id": len(sections), "title": title(), "kind": "table_row", "text": row_text})
+            continue
+
+        table_header = None
+        if line and line != "---":
+            body_lines.append(line)
+
+    flush_body()
+    return sections
+
+
+# BM25 index over the credit policy sections
+class PolicyIndex:
+    """Ranks policy sections against a question with BM25 and optional embeddings."""
+
+    def __init__(self, sections, embed_fn=None, k1=1.5, b=0.75, embedding_weight=0.5):
+        self.sections = sections
+        self.embed_fn = embed_fn
+        self.k1 = k1
+        self.b = b
+        self.embedding_weight = embedding_weight
+
+        self.term_counts = [Counter(tokenize(section["title"] + " " + section["text"])) for section in sections]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(sections)
+        self.idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+        self.embeddings = None
+        if embed_fn is not None and sections:
+            self.embeddings = embed_fn([section["title"] + "\n" + section["text"] for section in sections])
+
+        self.full_text_tokens = sum(estimate_tokens(section["text"]) for section in sections)
+
+    @classmethod
+    def from_markdown(cls, markdown_text, embed_fn=None):
+        """Builds an index from the raw credit policy markdown."""
+        index = cls(parse_policy_sections(markdown_text), embed_fn=embed_fn)
+        index.full_text_tokens = estimate_tokens(markdown_text)
+        return index
+
+    def bm25_scores(self, query):
+        """Returns the BM25 score of every section for the query."""
+        terms = tokenize(query)
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            for term in terms:
+                freq = counts.get(term)
+                if not freq:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+                score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+    def search(self, query, top_k=4):
+        """Returns up to ``top_k`` ``(score, section)`` pairs, best match first."""
+        scores = self.bm25_scores(query)
+        if self.embeddings is not None:
+            best = max(scores) if scores else 0.0
+            query_vector = self.embed_fn([query])[0]
+            scores = [
+                (1 - self.embedding_weight) * (score / best if best else 0.0)
+                + self.embedding_weight * cosine_similarity(query_vector, vector)
+                for score, vector in zip(scores, self.embeddings)
+            ]
+        ranked = sorted(zip(scores, self.sections), key=lambda pair: pair[0], reverse=True)
+        return [(score, section) for score, section in ranked[:top_k] if score > 0]
+
+    def build_context(self, query, top_k=4, token_budget=1200):
+        """Selects the best sections for a question within a prompt token budget.
+
+        Returns a dict with the ``context`` text, the titles and ids of the
+        sections used (in document order) and token counts for the context and
+        the full policy. When nothing in the policy matches, every section is
+        sent regardless of the budget, as cutting the policy in document order
+        would drop the rules that come last.
+        """
+        hits = [section for _, section in self.search(query, top_k=top_k)]
+        if not hits:
+            hits = list(self.sections)
+            token_budget = math.inf
+
+        selected = []
+        used_tokens = 0
+        for section in hits:
+            section_tokens = estimate_tokens(section["title"] + section["text"])
+            if selected and used_tokens + section_tokens > token_budget:
+                continue
+            selected.append(section)
+            used_tokens += section_tokens
+        selected.sort(key=lambda section: section["id"])
+
+        context = "\n\n".join(f"[{section['title']}]\n{section['text']}" for section in selected)
+        context_tokens = estimate_tokens(context)
+        return {
+            "context": context,
+            "sections": list(dict.fromkeys(section["title"] for section in selected)),
+            "section_ids": [section["id"] for section in selected],
+            "context_tokens": context_tokens,
+            "full_tokens": self.full_text_tokens,
+            "saved_tokens": max(0, self.full_text_tokens - context_tokens),
+        }
+
+
+# Function to compute cosine similarity between two vectors
+def cosine_similarity(a, b):
+    """Returns the cosine similarity of two equal-length vectors."""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
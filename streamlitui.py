@@ -1,12 +1,25 @@
 import streamlit as st
-import google.generativeai as genai
+import atexit
 import base64
+import importlib
+import json
 import os
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
-import pandas as pd
 from datetime import datetime
-import gspread
-from google.oauth2.service_account import Credentials
+from policy_retrieval import PolicyIndex, estimate_tokens
+from answer_cache import AnswerCache, policy_version
+from policy_facts import PolicyFacts
+from login_audit import LoginAuditWriter
+from login_mirror import COLUMNS as LOGIN_COLUMNS, LoginMirror
+from conversation import ConversationMemory, extractive_summary, is_follow_up, min_window_messages
+from chat_history import ChatHistory, remove_stale_archives
+from hybrid_router import HybridRouter, load_thresholds
+from tracing import Tracer
+from gemini_dispatcher import GeminiDispatcher
+from answering import NO_ANSWER, compose_prompt
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -18,11 +31,110 @@ if not API_KEY:
     st.error("API Key is missing. Please check your Streamlit secrets.")
     st.stop()
 
-genai.configure(api_key=API_KEY)
-
-# Google Sheets Authentication
+# Startup mode: "lazy" imports the Google SDKs and pandas on first use, "prewarm" imports them in the
+# background after the first page is drawn, "eager" imports them before anything is drawn
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy")
+HEAVY_MODULES = ("google.generativeai", "gspread", "google.oauth2.service_account", "pandas")
+
+# Retrieval settings: how much of the credit policy goes into each prompt
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "1200"))
+RETRIEVAL_EMBEDDINGS = os.getenv("RETRIEVAL_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+RETRIEVAL_AUDIT_LOG = os.getenv("RETRIEVAL_AUDIT_LOG", "retrieval_audit.jsonl")
+
+# Answer cache settings, shared by all sessions of this app
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "answer_cache.sqlite3")
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Conversation memory: recent turns kept verbatim, older ones summarized, within a token budget
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "800"))
+CONVERSATION_RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "3"))
+CONVERSATION_LLM_SUMMARY = os.getenv("CONVERSATION_LLM_SUMMARY", "false").lower() in ("1", "true", "yes")
+
+# Chat history: messages kept in memory per session (older ones are archived to disk) and messages shown per page
+# (a smaller window than min_window_messages would archive questions before they are summarized)
+CHAT_WINDOW_MESSAGES = max(int(os.getenv("CHAT_WINDOW_MESSAGES", "40")), min_window_messages(CONVERSATION_RECENT_TURNS))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "chat_archive")
+# Archives of sessions closed without a reset or logout are deleted after this long
+CHAT_ARCHIVE_MAX_AGE_HOURS = float(os.getenv("CHAT_ARCHIVE_MAX_AGE_HOURS", "24"))
+
+# Login audit writer settings
+LOGIN_AUDIT_BATCH_SIZE = int(os.getenv("LOGIN_AUDIT_BATCH_SIZE", "50"))
+LOGIN_AUDIT_FLUSH_SECONDS = float(os.getenv("LOGIN_AUDIT_FLUSH_SECONDS", "2"))
+LOGIN_AUDIT_SPILL_PATH = os.getenv("LOGIN_AUDIT_SPILL_PATH", "login_spill.jsonl")
+
+# Local mirror of the login sheet and how long a sync stays fresh
+LOGIN_MIRROR_PATH = os.getenv("LOGIN_MIRROR_PATH", "login_mirror.sqlite3")
+LOGIN_MIRROR_FRESHNESS_SECONDS = float(os.getenv("LOGIN_MIRROR_FRESHNESS_SECONDS", "60"))
+
+# Hybrid router: the BERT classifier answers first when confident (disabled when no model directory is set)
+HYBRID_ROUTER_MODEL_DIR = os.getenv("HYBRID_ROUTER_MODEL_DIR", "")
+HYBRID_ROUTER_BACKEND = os.getenv("HYBRID_ROUTER_BACKEND", "torch")
+HYBRID_ROUTER_LOG = os.getenv("HYBRID_ROUTER_LOG", "router_log.jsonl")
+
+# Tracing: per-stage timings go to a metrics file and, when a port is set, a Prometheus endpoint
+METRICS_PATH = os.getenv("METRICS_PATH", "metrics.jsonl")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_MAX_MB = float(os.getenv("METRICS_MAX_MB", "10"))
+# Shared Gemini dispatcher: concurrent calls per process and retries on rate limits
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+GEMINI_BACKOFF_SECONDS = float(os.getenv("GEMINI_BACKOFF_SECONDS", "1"))
+
+ADMIN_EMPLOYEE_IDS = {emp_id.strip() for emp_id in os.getenv("ADMIN_EMPLOYEE_IDS", "").split(",") if emp_id.strip()}
+
+# One tracer per process, kept across reruns
+@st.cache_resource
+def get_tracer():
+    """Creates the process-wide tracer and starts the metrics endpoint when configured."""
+    # Only runs that answered a question are kept; the rest still count towards the stage totals
+    tracer = Tracer(
+        METRICS_PATH,
+        max_bytes=int(METRICS_MAX_MB * 2**20),
+        keep_if=lambda trace: "question_chars" in trace["attributes"]
+    )
+    if METRICS_PORT:
+        tracer.start_metrics_server(METRICS_PORT)
+    return tracer
+
+tracer = get_tracer()
+
+# Function to import the heavy SDKs ahead of first use
+def import_heavy_modules():
+    """Imports the Google SDKs and pandas so later calls find them in sys.modules."""
+    with tracer.span("import_heavy_modules"):
+        for name in HEAVY_MODULES:
+            importlib.import_module(name)
+
+# Start importing the heavy SDKs in the background, once per process
+@st.cache_resource
+def prewarm_heavy_modules():
+    """Imports the heavy SDKs on a daemon thread so the first question does not wait for them."""
+    thread = threading.Thread(target=import_heavy_modules, name="prewarm-imports", daemon=True)
+    thread.start()
+    return thread
+
+if STARTUP_MODE == "eager":
+    import_heavy_modules()
+
+# Gemini SDK, imported and configured on first use
+@st.cache_resource
+def get_genai():
+    """Returns the configured google.generativeai module."""
+    import google.generativeai as genai
+    genai.configure(api_key=API_KEY)
+    return genai
+
+# Google Sheets Authentication (one client shared by the whole process)
+@st.cache_resource
+@tracer.traced("sheets.authenticate")
 def authenticate_google_sheets():
     """Authenticate with Google Sheets using service account credentials."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     credentials = Credentials.from_service_account_info(
         st.secrets["gcp_service_account"], 
         scopes=["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive.file"]
@@ -31,8 +143,11 @@ def authenticate_google_sheets():
     return client
 
 # Function to get or create the Google Spreadsheet for login records
+@tracer.traced("sheets.open")
 def get_or_create_spreadsheet(client):
     """Get or create the Google Spreadsheet to store login records."""
+    import gspread
+
     try:
         # Attempt to open the existing spreadsheet
         spreadsheet = client.open("Chatbot_Login_Records")
@@ -42,34 +157,55 @@ def get_or_create_spreadsheet(client):
     return spreadsheet
 
 
+# Local mirror of the login records, shared by the whole process
+@st.cache_resource
+def get_login_mirror():
+    """Opens the SQLite mirror of the login records sheet."""
+    return LoginMirror(LOGIN_MIRROR_PATH, freshness_seconds=LOGIN_MIRROR_FRESHNESS_SECONDS)
+
 # Function to load login records from Google Sheets
+@tracer.traced("sheets.load_login_records")
 def load_login_records():
-    """Load login records from the Google Spreadsheet."""
-    client = authenticate_google_sheets()
-    spreadsheet = get_or_create_spreadsheet(client)
-    worksheet = spreadsheet.sheet1
-    try:
-        data = worksheet.get_all_records()
-        df = pd.DataFrame(data)
-        print(f"Loaded records: {df}")  # Debugging line
-    except gspread.exceptions.APIError as e:
-        print(f"Error loading records: {e}")
-        df = pd.DataFrame(columns=['Name', 'Employee_ID', 'Login_Time'])
+    """Load login records from the local mirror, first syncing new rows from the Google Spreadsheet if stale."""
+    import pandas as pd
+
+    mirror = get_login_mirror()
+    if not mirror.is_fresh():
+        import gspread
+
+        try:
+            client = authenticate_google_sheets()
+            worksheet = get_or_create_spreadsheet(client).sheet1
+            with tracer.span("sheets.sync") as span:
+                span["new_rows"] = mirror.sync(worksheet)
+        except gspread.exceptions.APIError as e:
+            print(f"Error loading records: {e}")
+    df = pd.DataFrame(mirror.records(), columns=LOGIN_COLUMNS)
+    print(f"Loaded {len(df)} login records")
     return df
 
+# Background writer that batches login records into the Google Spreadsheet
+@st.cache_resource
+def get_login_writer():
+    """Starts the process-wide login audit writer."""
+    # Authentication runs on the writer thread, so the login request never waits for it or sees its errors
+    writer = LoginAuditWriter(
+        lambda: get_or_create_spreadsheet(authenticate_google_sheets()).sheet1,
+        batch_size=LOGIN_AUDIT_BATCH_SIZE,
+        flush_interval=LOGIN_AUDIT_FLUSH_SECONDS,
+        spill_path=LOGIN_AUDIT_SPILL_PATH
+    )
+    # Write out the records still queued when the server shuts down
+    atexit.register(writer.stop)
+    return writer.start()
+
 # Function to save login record into Google Spreadsheet
-  # Function to save login record into Google Spreadsheet
+@tracer.traced("sheets.save_login_record")
 def save_login_record(name, emp_id):
-    """Save a new login record into the Google Spreadsheet."""
-    client = authenticate_google_sheets()
-    spreadsheet = get_or_create_spreadsheet(client)
-    worksheet = spreadsheet.sheet1
-    new_record = ["Test User", "12345", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-    print(f"Appending record: {new_record}")
-    try:
-        worksheet.append_row(new_record)
-    except Exception as e:
-        print(f"Error saving record: {e}")
+    """Queue a new login record for the Google Spreadsheet without waiting on the network."""
+    new_record = [name, emp_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+    print(f"Queueing record: {new_record}")
+    get_login_writer().submit(new_record)
 
 
 # Login page CSS
@@ -122,22 +258,37 @@ def load_login_css():
         </style>
     """, unsafe_allow_html=True)
 
+# Function to get a file's modification time, the cache key of static assets
+def file_mtime(path):
+    """Returns the file's mtime in nanoseconds, or None when it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+# Static text files, read from disk only when their mtime changes
+@st.cache_resource(max_entries=16)
+def read_text_asset(path, mtime_ns):
+    """Returns the text of a file; ``mtime_ns`` is only part of the cache key."""
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
+
 # Load the Credit Policy Markdown file
+@tracer.traced()
 def load_credit_policy(file_path):
     """Loads credit policy text from a file, or returns a default message if missing."""
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as file:
-            return file.read()
+    mtime_ns = file_mtime(file_path)
+    if mtime_ns is not None:
+        return read_text_asset(file_path, mtime_ns)
     return "No credit policy found. Please upload a policy document."
 
-# Function to set background image
-def set_background(image_path):
-    """Sets the background image for the Streamlit app."""
-    if os.path.exists(image_path):
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode()
-        st.markdown(
-            f"""
+# Background image CSS, base64-encoded only when the image changes
+@st.cache_resource(max_entries=4)
+def background_css(image_path, mtime_ns):
+    """Returns the style block that puts the image behind the app."""
+    with open(image_path, "rb") as image_file:
+        encoded_string = base64.b64encode(image_file.read()).decode()
+    return f"""
             <style>
             .stApp {{
                 background-image: url(data:image/png;base64,{encoded_string});
@@ -156,19 +307,285 @@ def set_background(image_path):
                 z-index: -1;
             }}
             </style>
-            """,
-            unsafe_allow_html=True
+            """
+
+# Function to set background image
+@tracer.traced()
+def set_background(image_path):
+    """Sets the background image for the Streamlit app."""
+    mtime_ns = file_mtime(image_path)
+    if mtime_ns is not None:
+        st.markdown(background_css(image_path, mtime_ns), unsafe_allow_html=True)
+
+# Initialize Gemini Model behind a dispatcher shared by every session
+@st.cache_resource
+def get_gemini_dispatcher():
+    """Creates the process-wide Gemini dispatcher and exports its queue metrics."""
+    dispatcher = GeminiDispatcher(
+        get_genai().GenerativeModel("gemini-pro"),
+        max_concurrency=GEMINI_MAX_CONCURRENCY,
+        max_retries=GEMINI_MAX_RETRIES,
+        backoff_base=GEMINI_BACKOFF_SECONDS
+    )
+    tracer.add_metric("chatbot_gemini_queue_depth", lambda: dispatcher.stats()["waiting"], "Gemini calls waiting for a free slot.")
+    tracer.add_metric("chatbot_gemini_active_calls", lambda: dispatcher.stats()["active"], "Gemini calls currently running.")
+    tracer.add_metric("chatbot_gemini_coalesced_total", lambda: dispatcher.stats()["coalesced"], "Prompts answered by an identical in-flight call.", "counter")
+    tracer.add_metric("chatbot_gemini_rate_limited_total", lambda: dispatcher.stats()["rate_limited"], "Gemini calls retried after a rate limit.", "counter")
+    return dispatcher
+
+# Function to embed policy sections and questions for retrieval
+def embed_texts(texts):
+    """Returns Gemini embeddings for a list of texts."""
+    result = get_genai().embed_content(model="models/embedding-001", content=texts)
+    return result["embedding"]
+
+# Build the retrieval index once per policy text and share it across sessions
+@st.cache_resource
+def get_policy_index(credit_policy_text):
+    """Indexes the credit policy headings, sub-sections and table rows."""
+    return PolicyIndex.from_markdown(
+        credit_policy_text,
+        embed_fn=embed_texts if RETRIEVAL_EMBEDDINGS else None
+    )
+
+# Parse the policy tables and rules once per policy text for instant lookups
+@st.cache_resource
+def get_policy_facts(credit_policy_text):
+    """Builds the structured fact store used to answer simple lookups locally."""
+    return PolicyFacts.from_markdown(credit_policy_text)
+
+# Load the BERT classifier behind the hybrid router once per process
+@st.cache_resource
+def get_hybrid_router():
+    """Returns the confidence-gated classifier router, or None when it is not configured."""
+    if not HYBRID_ROUTER_MODEL_DIR or not os.path.isdir(HYBRID_ROUTER_MODEL_DIR):
+        return None
+    # Imported here so the app does not need torch unless the router is enabled
+    from transformers import BertTokenizer
+    from bert_inference import LabelIndex, load_classifier, predict_probabilities
+
+    tokenizer = BertTokenizer.from_pretrained(HYBRID_ROUTER_MODEL_DIR)
+    model = load_classifier(HYBRID_ROUTER_MODEL_DIR, backend=HYBRID_ROUTER_BACKEND)
+    label_index = LabelIndex.load(HYBRID_ROUTER_MODEL_DIR)
+    label_index.check_model(model)
+    thresholds = load_thresholds(HYBRID_ROUTER_MODEL_DIR)
+    return HybridRouter(
+        classify_fn=lambda question: predict_probabilities([question], model, tokenizer)[0].tolist(),
+        answer_fn=label_index.answer,
+        confidence_threshold=thresholds["confidence"],
+        margin_threshold=thresholds["margin"],
+        log_path=HYBRID_ROUTER_LOG
+    )
+
+# Labels shown under each bot message for the path that produced the answer
+ANSWER_SOURCES = {
+    "facts": "⚡ Instant answer from policy tables",
+    "classifier": "🎯 Answered by the FAQ classifier",
+    "cache": "💾 Cached answer",
+    "gemini": "✨ Answered by Gemini",
+}
+
+# Function to render a bot message together with the path that answered it
+def bot_message_html(content, source=None):
+    """Returns the HTML for a bot message, with the answer source underneath when known."""
+    source_html = ""
+    if source in ANSWER_SOURCES:
+        source_html = f"<br><small style='color: #B0B0B0;'>{ANSWER_SOURCES[source]}</small>"
+    return f"<div class='bot-message'><strong>Credit Policy Bot:</strong> {content}{source_html}</div>"
+
+# Function to render a user or bot message
+def message_html(message):
+    """Returns the HTML for one chat message."""
+    if message["role"] == "user":
+        return f"<div class='user-message'><strong>You:</strong> {message['content']}</div>"
+    return bot_message_html(message['content'], message.get('source'))
+
+# Function to record which policy sections were sent with a question
+def log_retrieval(question, retrieval):
+    """Appends the sections used for a question and the prompt tokens saved to the audit log."""
+    record = {
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "question": question,
+        "sections": retrieval["sections"],
+        "section_ids": retrieval["section_ids"],
+        "context_tokens": retrieval["context_tokens"],
+        "full_tokens": retrieval["full_tokens"],
+        "saved_tokens": retrieval["saved_tokens"],
+    }
+    print(f"Retrieved sections: {record['sections']} (saved {record['saved_tokens']} tokens)")
+    try:
+        with open(RETRIEVAL_AUDIT_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Error writing retrieval audit log: {e}")
+
+# Answer cache shared by every Streamlit session
+@st.cache_resource
+def get_answer_cache():
+    """Opens the persistent answer cache once per process."""
+    return AnswerCache(
+        ANSWER_CACHE_PATH,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS
+    )
+
+# Function to fold older chat turns into the running summary with Gemini
+def summarize_with_gemini(summary, messages):
+    """Asks Gemini to update the conversation summary with older messages."""
+    turns = ConversationMemory.format_turns(messages)
+    prompt = (
+        "Update this summary of a conversation about a credit policy with the new messages. "
+        "Keep product names, amounts and rates. Reply with the summary only.\n\n"
+        f"Summary so far:\n{summary or '(none)'}\n\nNew messages:\n{turns}"
+    )
+    try:
+        response = get_gemini_dispatcher().generate(prompt)
+        return response.text.strip()
+    except Exception as e:
+        print(f"Error summarizing conversation: {e}")
+        return extractive_summary(summary, messages)
+
+# Conversation memory for the current session
+def get_conversation_memory():
+    """Returns this session's conversation memory, creating it on first use."""
+    if 'conversation_memory' not in st.session_state:
+        st.session_state.conversation_memory = ConversationMemory(
+            token_budget=CONVERSATION_TOKEN_BUDGET,
+            recent_turns=CONVERSATION_RECENT_TURNS,
+            summarizer=summarize_with_gemini if CONVERSATION_LLM_SUMMARY else extractive_summary
         )
+    return st.session_state.conversation_memory
+
+# Sweep old chat archives at most once an hour per process
+@st.cache_data(ttl=3600, show_spinner=False)
+def sweep_chat_archives():
+    """Deletes chat archives older than CHAT_ARCHIVE_MAX_AGE_HOURS."""
+    removed = remove_stale_archives(CHAT_ARCHIVE_DIR, CHAT_ARCHIVE_MAX_AGE_HOURS * 3600)
+    if removed:
+        print(f"Removed {removed} stale chat archives from {CHAT_ARCHIVE_DIR}")
+    return removed
+
+# Chat history for a new session
+def new_chat_history():
+    """Creates a chat history that archives older messages to this session's own file."""
+    sweep_chat_archives()
+    return ChatHistory(
+        os.path.join(CHAT_ARCHIVE_DIR, f"{uuid.uuid4().hex}.jsonl"),
+        window=CHAT_WINDOW_MESSAGES
+    )
 
-# Initialize Gemini Model
-model = genai.GenerativeModel("gemini-pro")
+# Function to clear the chat on reset or logout
+def reset_chat():
+    """Forgets the session's messages, archive, conversation memory and paging."""
+    if 'messages' in st.session_state:
+        st.session_state.messages.clear()
+    st.session_state.pop('conversation_memory', None)
+    st.session_state.pop('history_pages', None)
+
+# Function to build the Gemini prompt from the relevant credit policy sections
+@tracer.traced()
+def build_prompt(question, credit_policy_text, mode="Standard", history=""):
+    """Retrieves the policy sections for a question and returns the prompt to send."""
+    # Follow-up questions lean on the previous turns, so they also steer retrieval
+    with tracer.span("retrieval") as span:
+        retrieval = get_policy_index(credit_policy_text).build_context(
+            f"{question}\n{history}" if history else question,
+            top_k=RETRIEVAL_TOP_K,
+            token_budget=RETRIEVAL_TOKEN_BUDGET
+        )
+        span["context_tokens"] = retrieval["context_tokens"]
+    log_retrieval(question, retrieval)
+    st.session_state.last_retrieval = retrieval
+
+    prompt = compose_prompt(question, retrieval["context"], mode, history)
+    st.session_state.last_prompt_tokens = estimate_tokens(prompt)
+    print(f"Prompt tokens: {st.session_state.last_prompt_tokens}")
+    return prompt
 
 # Function to Ask Questions
-def ask_gemini(question, credit_policy_text):
-    """Sends a question with the credit policy text to Gemini for a response."""
-    prompt = f"Use the following credit policy document to answer the question:\n\n{credit_policy_text}\n\nQuestion: {question}"
-    response = model.generate_content(prompt)
-    return response.text if response else "Sorry, I couldn't generate a response."
+def ask_gemini(question, credit_policy_text, mode="Standard", history=""):
+    """Answers a question from the cache, or from Gemini with the relevant credit policy sections."""
+    cache = get_answer_cache()
+    version = policy_version(credit_policy_text)
+    cache.use_policy_version(version)
+    with tracer.span("answer_cache") as span:
+        cached_answer = cache.get(question, mode, version, history)
+        span["hit"] = cached_answer is not None
+    if cached_answer is not None:
+        st.session_state.last_answer_source = "cache"
+        return cached_answer
+
+    st.session_state.last_answer_source = "gemini"
+    prompt = build_prompt(question, credit_policy_text, mode, history)
+    start_time = time.perf_counter()
+    with tracer.span("gemini", prompt_chars=len(prompt), prompt_tokens=estimate_tokens(prompt)) as span:
+        response = get_gemini_dispatcher().generate(prompt)
+        if response:
+            record_response_size(span, response.text, response)
+    log_latency(total=time.perf_counter() - start_time)
+    if not response:
+        return NO_ANSWER
+    cache.put(question, mode, version, response.text, history)
+    return response.text
+
+# Function to Ask Questions with a streamed response
+def ask_gemini_stream(question, credit_policy_text, mode="Standard", history=""):
+    """Yields the answer in chunks as Gemini generates it (a cached answer is yielded whole)."""
+    cache = get_answer_cache()
+    version = policy_version(credit_policy_text)
+    cache.use_policy_version(version)
+    with tracer.span("answer_cache") as span:
+        cached_answer = cache.get(question, mode, version, history)
+        span["hit"] = cached_answer is not None
+    if cached_answer is not None:
+        st.session_state.last_answer_source = "cache"
+        yield cached_answer
+        return
+
+    st.session_state.last_answer_source = "gemini"
+    prompt = build_prompt(question, credit_policy_text, mode, history)
+    start_time = time.perf_counter()
+    first_token_time = None
+    parts = []
+    with tracer.span("gemini", stream=True, prompt_chars=len(prompt), prompt_tokens=estimate_tokens(prompt)) as span:
+        chunk = None
+        for chunk in get_gemini_dispatcher().stream(prompt):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata) carry nothing to show
+                continue
+            if first_token_time is None:
+                first_token_time = time.perf_counter() - start_time
+                span["first_token_ms"] = round(first_token_time * 1000, 2)
+            parts.append(text)
+            yield text
+        record_response_size(span, "".join(parts), chunk)
+    log_latency(total=time.perf_counter() - start_time, first_token=first_token_time)
+
+    if not parts:
+        yield NO_ANSWER
+        return
+    cache.put(question, mode, version, "".join(parts), history)
+
+# Function to add the answer size and Gemini's token counts to a tracing span
+def record_response_size(span, text, response=None):
+    """Records response characters and tokens; Gemini's usage metadata wins over the estimate."""
+    span["response_chars"] = len(text)
+    span["response_tokens"] = estimate_tokens(text)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None and getattr(usage, "candidates_token_count", None):
+        span["prompt_tokens"] = usage.prompt_token_count
+        span["response_tokens"] = usage.candidates_token_count
+
+# Function to log how long Gemini took to answer
+def log_latency(total, first_token=None):
+    """Records time-to-first-token and total latency of the last Gemini call."""
+    st.session_state.last_latency = {"first_token": first_token, "total": total}
+    if first_token is None:
+        print(f"Gemini latency: total {total:.2f}s")
+    else:
+        print(f"Gemini latency: first token {first_token:.2f}s, total {total:.2f}s")
 
 # Function to Load Custom CSS
 def load_css():
@@ -269,8 +686,47 @@ def load_css():
         with open(css_file, "w") as f:
             f.write(css_content)
 
-    with open(css_file) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    # The stylesheet is read from disk again only after it is edited
+    st.markdown(f'<style>{read_text_asset(css_file, file_mtime(css_file))}</style>', unsafe_allow_html=True)
+
+# Admin view of the latest request traces
+def render_trace_admin():
+    """Shows per-stage totals and the stage breakdown of recent page runs."""
+    import pandas as pd
+
+    with st.expander("🛠 Request traces"):
+        totals = tracer.stage_totals()
+        if totals:
+            st.dataframe(pd.DataFrame([
+                {
+                    "stage": name,
+                    "calls": stage["count"],
+                    "mean ms": round(stage["seconds"] / stage["count"] * 1000, 1),
+                    "errors": stage["errors"],
+                    **stage["tokens"]
+                }
+                for name, stage in sorted(totals.items())
+            ]), hide_index=True)
+        dispatcher = get_gemini_dispatcher().stats()
+        st.caption(
+            f"Gemini: {dispatcher['active']} running · {dispatcher['waiting']} queued · "
+            f"{dispatcher['coalesced']} coalesced · {dispatcher['rate_limited']} rate-limit retries · "
+            f"{dispatcher['failures']} failures"
+        )
+        for trace in tracer.recent(10):
+            attributes = trace["attributes"]
+            st.markdown(
+                f"**{trace['time']}** · {trace['ms']:.0f} ms · {attributes.get('mode')} · "
+                f"{attributes['question_chars']} chars · answered by {attributes.get('source')}"
+            )
+            lines = []
+            for span in trace["spans"]:
+                details = ", ".join(
+                    f"{key} {value}" for key, value in span.items()
+                    if key not in ("name", "depth", "start_ms", "ms")
+                )
+                lines.append(f"{'    ' * span['depth']}- {span['name']}: {span['ms']:.0f} ms" + (f" ({details})" if details else ""))
+            st.markdown("\n".join(lines))
 
 # Main Streamlit App
 def main():
@@ -281,8 +737,9 @@ def main():
     )
 
     # Load CSS
-    load_css()
-    load_login_css()
+    with tracer.span("load_css"):
+        load_css()
+        load_login_css()
 
     # Session state for login
     if 'logged_in' not in st.session_state:
@@ -328,61 +785,171 @@ def main():
                 help="Choose how detailed you want the responses to be"
             )
 
+            # Stream answers as they are generated
+            stream_responses = st.checkbox(
+                "Stream responses",
+                value=True,
+                help="Show the answer while it is being generated"
+            )
+
             # Clear Chat History
             if st.button("🔄 Reset Conversation"):
-                st.session_state.messages = []
+                reset_chat()
                 st.rerun()
 
             # Logout Button
             if st.button("📤 Logout"):
                 st.session_state.logged_in = False
-                st.session_state.messages = []
+                reset_chat()
                 st.rerun()
 
+            # Answer cache counters (shared by all sessions)
+            cache_stats = get_answer_cache().stats()
+            st.caption(
+                f"💾 Answer cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+                f"{cache_stats['entries']} stored"
+            )
+
+            # How often the classifier answered without Gemini (shared by all sessions)
+            router = get_hybrid_router()
+            if router is not None and router.stats()["total"]:
+                router_stats = router.stats()
+                st.caption(
+                    f"🎯 Classifier answered {router_stats['classifier_rate']:.0%} of {router_stats['total']} questions · "
+                    f"{router_stats['mean_seconds']['classifier'] * 1000:.0f} ms vs "
+                    f"{router_stats['mean_seconds']['llm']:.2f}s via Gemini"
+                )
+
+            # Prompt size of the last question (0 when answered without Gemini)
+            if 'last_prompt_tokens' in st.session_state:
+                st.caption(f"🧮 Prompt tokens for last question: {st.session_state.last_prompt_tokens}")
+
+            # Latency of the last Gemini call
+            if 'last_latency' in st.session_state:
+                latency = st.session_state.last_latency
+                if latency["first_token"] is not None:
+                    st.caption(f"⏱ First token {latency['first_token']:.2f}s · total {latency['total']:.2f}s")
+                else:
+                    st.caption(f"⏱ Response time {latency['total']:.2f}s")
+
+            # Policy sections used for the last answer
+            if 'last_retrieval' in st.session_state:
+                retrieval = st.session_state.last_retrieval
+                with st.expander("📑 Sources for last answer"):
+                    for section in retrieval["sections"]:
+                        st.markdown(f"- {section}")
+                    st.caption(
+                        f"Prompt context: {retrieval['context_tokens']} of {retrieval['full_tokens']} "
+                        f"policy tokens ({retrieval['saved_tokens']} saved)"
+                    )
+
+            # Stage timings of recent requests, for admins only
+            if st.session_state.get("user_emp_id") in ADMIN_EMPLOYEE_IDS:
+                render_trace_admin()
+
         # Load credit policy
         credit_policy_text = load_credit_policy("Credit_Policy2.md")
 
         # Initialize chat history
         if 'messages' not in st.session_state:
-            st.session_state.messages = [
-                {
-                    "role": "assistant",
-                    "content": f"Hello {st.session_state.user_name}! I'm your Credit Policy Assistant. How can I help you today?"
-                }
-            ]
+            st.session_state.messages = new_chat_history()
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": f"Hello {st.session_state.user_name}! I'm your Credit Policy Assistant. How can I help you today?"
+            })
+        chat_history = st.session_state.messages
+
+        # Only the latest page of messages is rendered; earlier pages are loaded on request
+        visible = CHAT_PAGE_SIZE * (1 + st.session_state.get('history_pages', 0))
+        if len(chat_history) > visible:
+            if st.button(f"⬆️ Load earlier messages ({len(chat_history) - visible} more)"):
+                st.session_state.history_pages = st.session_state.get('history_pages', 0) + 1
+                st.rerun()
 
-        # Display chat messages
-        for message in st.session_state.messages:
-            if message["role"] == "user":
-                st.markdown(f"<div class='user-message'><strong>You:</strong> {message['content']}</div>", unsafe_allow_html=True)
-            else:
-                st.markdown(f"<div class='bot-message'><strong>Credit Policy Bot:</strong> {message['content']}</div>", unsafe_allow_html=True)
+        # Display chat messages as a single HTML block
+        with tracer.span("render_messages", messages=min(visible, len(chat_history))):
+            st.markdown("\n\n".join(message_html(message) for message in chat_history.last(visible)), unsafe_allow_html=True)
 
         # Chat input
         user_query = st.chat_input("Ask about the credit policy...")
 
         # Process user input
         if user_query:
-            st.session_state.messages.append({"role": "user", "content": user_query})
-
-            # Adjust response based on mode
-            additional_prompt = {
-                "Concise": " Please provide a very brief and to-the-point answer.",
-                "Detailed": " Please provide a comprehensive and detailed explanation.",
-                "Standard": ""
-            }.get(mode, "")
+            chat_history.append({"role": "user", "content": user_query})
+            st.session_state.pop('history_pages', None)
+            # Traces are persisted and shown to admins, so they record the question's length, not its text
+            tracer.annotate(question_chars=len(user_query), mode=mode)
+
+            # Earlier turns, kept within the conversation token budget
+            with tracer.span("conversation_memory") as span:
+                history = get_conversation_memory().build(chat_history.messages[:-1], offset=chat_history.archived)
+                span["history_tokens"] = history["tokens"]
+                # Only follow-ups carry the conversation: a standalone question gets the same answer
+                # in every session, so it is answered and cached without it
+                follow_up = bool(history["text"]) and is_follow_up(user_query)
+                span["follow_up"] = follow_up
+            context = history["text"] if follow_up else ""
+            st.session_state.last_prompt_tokens = 0
+
+            # Simple lookups (rates, fees, tenure, radius) are answered from the policy tables;
+            # follow-ups lean on earlier turns the tables know nothing about, so they go to Gemini
+            fact = None
+            if not follow_up:
+                with tracer.span("policy_facts") as span:
+                    fact = get_policy_facts(credit_policy_text).answer(user_query)
+                    span["hit"] = fact is not None
+
+            # Then the FAQ classifier, when enabled and confident; follow-ups keep going to Gemini
+            router = get_hybrid_router()
+            decision = None
+            if fact is None and router is not None and not follow_up:
+                with tracer.span("classifier") as span:
+                    decision = router.classify(user_query)
+                    span["accepted"] = decision["accepted"]
+            llm_start = time.perf_counter()
+
+            # Generate response (the mode adjusts how detailed the answer is)
+            if fact is not None:
+                response = fact["answer"]
+                st.session_state.last_answer_source = "facts"
+                print(f"Answered locally from policy facts (intent: {fact['intent']})")
+            elif decision is not None and decision["accepted"]:
+                response = decision["answer"]
+                st.session_state.last_answer_source = "classifier"
+                router.record(user_query, "classifier", decision["seconds"], decision)
+            elif stream_responses:
+                st.markdown(f"<div class='user-message'><strong>You:</strong> {user_query}</div>", unsafe_allow_html=True)
+                placeholder = st.empty()
+                placeholder.markdown("<div class='bot-message'><strong>Credit Policy Bot:</strong> ▌</div>", unsafe_allow_html=True)
+                response = ""
+                for chunk in ask_gemini_stream(user_query, credit_policy_text, mode, context):
+                    response += chunk
+                    placeholder.markdown(f"<div class='bot-message'><strong>Credit Policy Bot:</strong> {response}▌</div>", unsafe_allow_html=True)
+            else:
+                with st.spinner("Analyzing policy..."):
+                    response = ask_gemini(user_query, credit_policy_text, mode, context)
 
-            # Generate response
-            with st.spinner("Analyzing policy..."):
-                response = ask_gemini(user_query + additional_prompt, credit_policy_text)
+            # Escalated questions count towards the router's Gemini route
+            if decision is not None and not decision["accepted"]:
+                router.record(user_query, "llm", decision["seconds"] + time.perf_counter() - llm_start, decision)
 
             # Add bot response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            tracer.annotate(source=st.session_state.get("last_answer_source"), response_chars=len(response))
+            chat_history.append({
+                "role": "assistant",
+                "content": response,
+                "source": st.session_state.get("last_answer_source"),
+                "prompt_tokens": st.session_state.last_prompt_tokens
+            })
 
             # Refresh chat
             st.rerun()
 
 # Run the Streamlit App
 if __name__ == "__main__":
-    main()
+    with tracer.trace("page_run"):
+        main()
+    # Once the page is drawn, start loading what the first question will need
+    if STARTUP_MODE == "prewarm":
+        prewarm_heavy_modules()
    
@@ -1,62 +1,41 @@
+import os
+import time
 import streamlit as st
-import torch
-from transformers import BertTokenizer, BertForSequenceClassification
-from transformers import AutoConfig, AutoModelForSequenceClassification
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from googletrans import Translator
+from model_registry import ModelRegistry
+from translation import TRANSLATION_BACKENDS, TranslationService
 
-# Initialize the translator
-translator = Translator()
+# Initialize the translator (TRANSLATION_BACKEND selects googletrans, marian or identity)
+@st.cache_resource
+def get_translation_service():
+    backend = TRANSLATION_BACKENDS[os.getenv("TRANSLATION_BACKEND", "googletrans")]()
+    return TranslationService(backend)
 
-# Load the model and tokenizer
-model_path = "D:\credit_chatbot\credit_chatbot"
-tokenizer = BertTokenizer.from_pretrained(model_path)
-model = BertForSequenceClassification.from_pretrained(model_path)
+# Model, tokenizer, class order/answers and inference server: loaded once per process and shared by
+# all sessions, reloaded when the model directory changes (BERT_BACKEND selects torch, torch-int8 or onnx)
+@st.cache_resource
+def get_model_registry():
+    return ModelRegistry(
+        os.getenv("BERT_MODEL_DIR", r"D:\credit_chatbot\credit_chatbot"),
+        backend=os.getenv("BERT_BACKEND", "torch")
+    )
 
-# Load the label encoder and dataset
-df = pd.read_csv("clean_data.csv")  
-label_encoder = LabelEncoder()
-
-# Fit the label encoder based on your dataset labels
-label_encoder.fit(df['labels'])
+rerun_start = time.perf_counter()
+bundle = get_model_registry().get()
+model_overhead = time.perf_counter() - rerun_start
+label_index = bundle.label_index
 
 # Function to translate text to English (if required)
 def translate_to_english(text, user_language):
     if user_language != 'English':
-        translated = translator.translate(text, src='hi', dest='en')
-        return translated.text
+        return get_translation_service().translate(text, 'hi', 'en')
     return text
 
 # Function to translate text to Hindi (if required)
 def translate_to_hindi(text, user_language):
     if user_language == 'Hindi':
-        translated = translator.translate(text, src='en', dest='hi')
-        return translated.text
+        return get_translation_service().translate(text, 'en', 'hi')
     return text
 
-# Predict function to interact with the model
-def predict(question, model, tokenizer, df, label_encoder):
-    # Ensure the model is on the correct device (GPU or CPU)
-    device = model.device  # Get the model's device (CUDA or CPU)
-    
-    # Tokenize the question and move the tensors to the correct device
-    inputs = tokenizer(question, truncation=True, padding=True, max_length=128, return_tensors="pt")
-    
-    # Move the tokenized input tensors to the same device as the model
-    inputs = {key: val.to(device) for key, val in inputs.items()}
-    
-    # Perform inference on the model
-    outputs = model(**inputs)
-    
-    # Get the predicted label index and convert it to the label
-    predicted_label_idx = torch.argmax(outputs.logits, dim=1).item()
-    predicted_label = label_encoder.inverse_transform([predicted_label_idx])[0]
-    
-    # Retrieve the corresponding answer in English
-    answer = df[df["labels"] == predicted_label]["answers"].iloc[0]
-    return answer
-
 # Streamlit UI
 st.title("Chatbot Interface")
 st.write("Ask a question to the trained chatbot! (Choose Hindi or English)")
@@ -73,13 +52,22 @@ if user_input:
         question_in_english = translate_to_english(user_input, user_language)
         
         # Step 2: Predict the answer based on the English question
-        answer_in_english = predict(question_in_english, model, tokenizer, df, label_encoder)
+        predicted_label_idx = bundle.server.submit(question_in_english).result()
         
-        # Step 3: Translate the answer back to Hindi if the user selected Hindi
-        final_answer = translate_to_hindi(answer_in_english, user_language)
+        # Step 3: Use the precomputed Hindi answer, translating (cached) only if none was built
+        if user_language == 'Hindi' and 'hi' in label_index.translations:
+            final_answer = label_index.answer(predicted_label_idx, 'hi')
+        else:
+            final_answer = translate_to_hindi(label_index.answer(predicted_label_idx), user_language)
         
         # Display only the user question and the final translated answer
         st.write(f"Question: {user_input}")
         st.success(f"Answer: {final_answer}")
 else:
     st.warning("Please enter a question to get a response!")
+
+# Startup cost of the shared model and what this rerun spent getting it
+st.caption(
+    f"Model v{bundle.version} loaded once in {bundle.load_seconds:.2f}s · "
+    f"this interaction spent {model_overhead * 1000:.2f} ms on the model"
+)
@@ -0,0 +1,27 @@
+from chat_history import ChatHistory
+from conversation import ConversationMemory, min_window_messages
+
+
+def summarized_questions(tmp_path, window, recent_turns=3, questions=20):
+    summarized = []
+    memory = ConversationMemory(
+        token_budget=100_000, recent_turns=recent_turns,
+        summarizer=lambda summary, messages: summarized.extend(m["content"] for m in messages) or summary
+    )
+    history = ChatHistory(str(tmp_path / "archive.jsonl"), window=window)
+    history.append({"role": "assistant", "content": "Hello"})
+    for i in range(questions):
+        history.append({"role": "user", "content": f"q{i}"})
+        memory.build(history.messages[:-1], offset=history.archived)
+        history.append({"role": "assistant", "content": f"a{i}"})
+    return summarized
+
+
+def test_minimum_window_summarizes_every_older_question(tmp_path):
+    summarized = summarized_questions(tmp_path, min_window_messages(3))
+    assert all(f"q{i}" in summarized for i in range(20 - 3 - 1))
+
+
+def test_smaller_window_archives_questions_unsummarized(tmp_path):
+    summarized = summarized_questions(tmp_path, min_window_messages(3) - 1)
+    assert "q0" not in summarized
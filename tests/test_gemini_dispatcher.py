@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from fakes import FakeAPIError, FakeGenerativeModel, FakeRateLimitError
+from gemini_dispatcher import GeminiDispatcher
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_identical_in_flight_prompts_share_one_call():
+    model = FakeGenerativeModel(first_token_latency=0.2, output_tokens=5)
+    dispatcher = GeminiDispatcher(model)
+    results = []
+    leader = threading.Thread(target=lambda: results.append(dispatcher.generate("same prompt")))
+    leader.start()
+    wait_until(lambda: dispatcher.stats()["active"] == 1)
+
+    follower = dispatcher.generate("same prompt")
+    leader.join()
+
+    assert model.calls == 1
+    assert dispatcher.stats()["coalesced"] == 1
+    assert follower is results[0]
+
+
+def test_follower_of_a_stream_gets_the_whole_answer():
+    model = FakeGenerativeModel(first_token_latency=0.2, output_tokens=5, chunk_tokens=2)
+    dispatcher = GeminiDispatcher(model)
+    chunks = []
+    leader = threading.Thread(target=lambda: chunks.extend(chunk.text for chunk in dispatcher.stream("same prompt")))
+    leader.start()
+    wait_until(lambda: dispatcher.stats()["active"] == 1)
+
+    follower = list(dispatcher.stream("same prompt"))
+    leader.join()
+
+    assert model.calls == 1
+    assert [chunk.text for chunk in follower] == ["".join(chunks)]
+
+
+def test_different_prompts_are_not_coalesced():
+    model = FakeGenerativeModel(output_tokens=5)
+    dispatcher = GeminiDispatcher(model)
+    dispatcher.generate("first prompt")
+    dispatcher.generate("second prompt")
+    assert model.calls == 2 and dispatcher.stats()["coalesced"] == 0
+
+
+def test_rate_limits_are_retried_with_growing_backoff():
+    model = FakeGenerativeModel(output_tokens=5, rate_limit_next=2)
+    delays = []
+    dispatcher = GeminiDispatcher(model, max_retries=4, backoff_base=1.0, sleep=delays.append)
+
+    response = dispatcher.generate("prompt")
+
+    assert response.text
+    assert model.calls == 3
+    assert dispatcher.stats()["rate_limited"] == 2
+    assert 1.0 <= delays[0] <= 2.0 and 2.0 <= delays[1] <= 4.0
+
+
+def test_rate_limit_beyond_the_retries_is_raised():
+    model = FakeGenerativeModel(output_tokens=5, rate_limit_next=5)
+    dispatcher = GeminiDispatcher(model, max_retries=2, sleep=lambda seconds: None)
+
+    with pytest.raises(FakeRateLimitError):
+        dispatcher.generate("prompt")
+    assert model.calls == 3
+    assert dispatcher.stats()["failures"] == 1
+
+
+def test_other_errors_are_not_retried():
+    model = FakeGenerativeModel(output_tokens=5, fail_next=1)
+    dispatcher = GeminiDispatcher(model, sleep=lambda seconds: None)
+
+    with pytest.raises(FakeAPIError):
+        dispatcher.generate("prompt")
+    assert model.calls == 1
+    assert dispatcher.stats()["rate_limited"] == 0
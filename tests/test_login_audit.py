@@ -0,0 +1,47 @@
+from fakes import FakeWorksheet
+from login_audit import LoginAuditWriter
+
+HEADER = ["Name", "Employee ID", "Login Time"]
+
+
+def make_writer(worksheet, tmp_path, **kwargs):
+    writer = LoginAuditWriter(lambda: worksheet, max_retries=1, spill_path=str(tmp_path / "spill.jsonl"), **kwargs)
+    writer.sleep = lambda seconds: None
+    return writer
+
+
+def test_failed_batch_is_spilled_then_replayed_before_new_rows(tmp_path):
+    worksheet = FakeWorksheet([HEADER], fail_next=2)
+    writer = make_writer(worksheet, tmp_path)
+
+    assert not writer.flush([["Asha", "E1", "09:00"]])
+    assert worksheet.rows == [HEADER]
+    assert writer.pending() == 1 and writer.spilled == 1
+
+    assert writer.flush([["Ravi", "E2", "09:05"]])
+    assert worksheet.rows == [HEADER, ["Asha", "E1", "09:00"], ["Ravi", "E2", "09:05"]]
+    assert writer.pending() == 0 and writer.written == 2
+    assert not (tmp_path / "spill.jsonl").exists()
+
+
+def test_spill_keeps_rows_across_repeated_outages(tmp_path):
+    worksheet = FakeWorksheet([HEADER], fail_next=4)
+    writer = make_writer(worksheet, tmp_path)
+
+    assert not writer.flush([["Asha", "E1", "09:00"]])
+    assert not writer.flush([["Ravi", "E2", "09:05"]])
+    assert writer.pending() == 2
+
+    assert writer.flush([])
+    assert worksheet.rows[1:] == [["Asha", "E1", "09:00"], ["Ravi", "E2", "09:05"]]
+
+
+def test_stop_flushes_queued_records_in_one_batch(tmp_path):
+    worksheet = FakeWorksheet([HEADER])
+    writer = make_writer(worksheet, tmp_path, flush_interval=60)
+    for i in range(3):
+        writer.submit([f"User {i}", f"E{i}", "09:00"])
+    writer.start().stop()
+
+    assert [row[1] for row in worksheet.rows[1:]] == ["E0", "E1", "E2"]
+    assert worksheet.calls == 1
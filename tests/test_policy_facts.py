@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from policy_facts import PolicyFacts, valid_product_cell
+
+POLICY_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "Credit_Policy2.md")
+
+PRODUCT_TABLE = """## 3. Loan Products & Eligibility
+| Loan Type                | Amount Range | Tenure    | Interest Rate (ROI) |
+|--------------------------|--------------|-----------|---------------------|
+| Loan Against Property    | ₹2 lakh - ₹50 lakh | 3-7 years | 19% - 24% |
+| **GP Property**          | Based on property | 3-7 years | 20% - 24% |
+| Above GP Property        | **19% - 24%**     | -         | -         |
+"""
+
+
+def test_rate_in_amount_column_is_rejected():
+    assert not valid_product_cell("amount", "**19% - 24%**")
+    assert valid_product_cell("amount", "₹2 lakh - ₹50 lakh")
+    assert valid_product_cell("amount", "Based on property")
+    assert valid_product_cell("roi", "-")
+
+
+def test_malformed_product_row_is_dropped():
+    facts = PolicyFacts.from_markdown(PRODUCT_TABLE)
+    assert set(facts.products) == {"Loan Against Property", "GP Property"}
+
+
+def test_dropped_product_is_not_answered_as_another():
+    facts = PolicyFacts.from_markdown(PRODUCT_TABLE)
+    # "above gp property" also contains "gp property", which must not answer for it
+    assert facts.answer("What is the ROI for above GP property?") is None
+    assert facts.answer("What is the ROI for GP property?")["answer"] == "Interest rate (ROI) for GP Property: 20% - 24%."
+
+
+@pytest.fixture(scope="module")
+def facts():
+    with open(POLICY_PATH, "r", encoding="utf-8") as f:
+        return PolicyFacts.from_markdown(f.read())
+
+
+@pytest.mark.parametrize("question, intent, answer", [
+    ("What is the processing fee?", "processing_fee", "Processing Fee (PF): 3%."),
+    ("PF?", "processing_fee", "Processing Fee (PF): 3%."),
+    ("What is the LTV?", "ltv", "Maximum Loan-to-Value (LTV): 50% of Market Value."),
+    ("What is the minimum income?", "min_income", "Minimum Income: ₹20,000 per month."),
+    ("tenure for LAP", "tenure", "Tenure for Loan Against Property: 3-7 years."),
+    ("What is the distance from branch allowed?", "radius", "Maximum Distance: 50 KM from the nearest branch."),
+])
+def test_single_intent_lookups_are_answered(facts, question, intent, answer):
+    assert facts.answer(question) == {"intent": intent, "answer": answer}
+
+
+def test_rate_question_without_product_lists_every_product(facts):
+    answer = facts.answer("What is the interest rate?")["answer"]
+    assert answer.startswith("Interest rate (ROI) by loan product:")
+    assert "- Loan Against Property: 19% - 24%" in answer
+
+
+@pytest.mark.parametrize("question", [
+    "Is the processing fee refundable?",          # yes/no question
+    "Explain the processing fee",                 # needs reasoning
+    "What is the processing fee and the ROI?",    # two intents
+    "What is the amount of insurance?",           # intent keyword, other subject
+    "Who approves deviations?",                   # no intent
+])
+def test_other_questions_are_left_to_gemini(facts, question):
+    assert facts.answer(question) is None
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import torch
+
+# Tokenizer used by the pool workers, set once per worker process
+worker_tokenizer = None
+
+
+def init_worker(tokenizer):
+    global worker_tokenizer
+    worker_tokenizer = tokenizer
+
+
+def tokenize_chunk(args):
+    questions, max_length = args
+    return worker_tokenizer(questions, truncation=True, max_length=max_length)["input_ids"]
+
+
+# Function to fingerprint the questions and tokenizer settings of a split
+def cache_key(questions, tokenizer, max_length):
+    """Returns a key that changes with the data, the tokenizer or max_length."""
+    digest = hashlib.sha256()
+    digest.update(f"{tokenizer.name_or_path}|{type(tokenizer).__name__}|{len(tokenizer)}|{max_length}".encode("utf-8"))
+    for question in questions:
+        digest.update(question.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()[:20]
+
+
+# Function to tokenize questions across all CPU cores
+def tokenize_parallel(questions, tokenizer, max_length=128, workers=None):
+    """Returns the token ids of every question, tokenizing chunks in a process pool."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(questions) < 2_000:
+        return tokenizer(questions, truncation=True, max_length=max_length)["input_ids"]
+    chunk_size = -(-len(questions) // (workers * 4))
+    chunks = [(questions[i:i + chunk_size], max_length) for i in range(0, len(questions), chunk_size)]
+    with Pool(workers, initializer=init_worker, initargs=(tokenizer,)) as pool:
+        return [ids for chunk in pool.map(tokenize_chunk, chunks) for ids in chunk]
+
+
+# Function to tokenize a split once and memory-map it on later runs
+def tokenize_cached(questions, tokenizer, max_length=128, cache_dir=".token_cache", workers=None):
+    """Returns packed token ids, per-question offsets and cache info for a list of questions.
+
+    The token ids of all questions are stored back to back in ``input_ids.npy``
+    with ``offsets.npy`` marking where each question starts. Warm runs
+    memory-map both files instead of tokenizing. The returned info dict has
+    ``hit``, ``seconds`` (time spent now) and ``saved_seconds`` (the cold
+    tokenization time avoided by a hit).
+    """
+    questions = list(questions)
+    path = os.path.join(cache_dir, cache_key(questions, tokenizer, max_length))
+    meta_path = os.path.join(path, "meta.json")
+    start = time.perf_counter()
+
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        # Copy-on-write mapping: pages are read lazily and the arrays stay writable for torch
+        input_ids = np.load(os.path.join(path, "input_ids.npy"), mmap_mode="c")
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="c")
+        seconds = time.perf_counter() - start
+        info = {"hit": True, "seconds": seconds, "saved_seconds": max(0.0, meta["tokenize_seconds"] - seconds)}
+        return torch.from_numpy(input_ids), torch.from_numpy(offsets), info
+
+    token_ids = tokenize_parallel(questions, tokenizer, max_length, workers)
+    lengths = np.fromiter((len(ids) for ids in token_ids), dtype=np.int64, count=len(token_ids))
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    input_ids = np.fromiter((token for ids in token_ids for token in ids), dtype=np.int32, count=int(offsets[-1]))
+    seconds = time.perf_counter() - start
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "input_ids.npy"), input_ids)
+    np.save(os.path.join(path, "offsets.npy"), offsets)
+    # meta.json is written last, so a half-written cache entry is never treated as a hit
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"questions": len(questions), "tokenize_seconds": seconds}, f)
+    info = {"hit": False, "seconds": seconds, "saved_seconds": 0.0}
+    return torch.from_numpy(input_ids), torch.from_numpy(offsets), info
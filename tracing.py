@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Lightweight per-stage tracer for the chat request path
+class Tracer:
+    """Records timed spans grouped into traces, one trace per page run.
+
+    ``trace()`` opens a trace for the current thread (Streamlit runs each
+    session's script in its own thread); ``span()`` times one stage inside it.
+    Spans opened outside a trace (e.g. in the login writer thread) are only
+    added to the per-stage totals. Finished traces for which ``keep_if(trace)``
+    is true (all of them without ``keep_if``) are kept in memory for the admin
+    view and appended as JSON lines to ``metrics_path``, which is rotated to
+    ``metrics_path + ".1"`` once it grows past ``max_bytes``.
+    """
+
+    def __init__(self, metrics_path="metrics.jsonl", max_traces=50, max_bytes=10 * 2**20, keep_if=None):
+        self.metrics_path = metrics_path
+        self.max_bytes = max_bytes
+        self.keep_if = keep_if
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.traces = deque(maxlen=max_traces)
+        self.stages = {}
+        self.metrics = {}
+
+    @contextmanager
+    def trace(self, name, **attributes):
+        """Times a whole request; spans opened inside it are attached to it."""
+        if getattr(self.local, "trace", None) is not None:
+            with self.span(name, **attributes) as nested:
+                yield nested
+            return
+        trace = {"name": name, "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "attributes": attributes, "spans": []}
+        self.local.trace = trace
+        self.local.depth = 0
+        start = time.perf_counter()
+        self.local.start = start
+        try:
+            yield attributes
+        except Exception as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.local.trace = None
+            trace["ms"] = round(seconds * 1000, 2)
+            # Spans that start in the same millisecond keep parents before their children
+            trace["spans"].sort(key=lambda span: (span["start_ms"], span["depth"]))
+            self._add_to_totals(name, seconds, attributes)
+            if self.keep_if is None or self.keep_if(trace):
+                with self.lock:
+                    self.traces.append(trace)
+                self._write(trace)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Times one stage; the yielded dict takes extra attributes such as token counts."""
+        trace = getattr(self.local, "trace", None)
+        depth = getattr(self.local, "depth", 0)
+        self.local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except Exception as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.local.depth = depth
+            self._add_to_totals(name, seconds, attributes)
+            if trace is not None:
+                trace["spans"].append({
+                    "name": name,
+                    "depth": depth,
+                    "start_ms": round((start - self.local.start) * 1000, 2),
+                    "ms": round(seconds * 1000, 2),
+                    **attributes,
+                })
+
+    def traced(self, name=None):
+        """Decorator that runs every call of a function in a span."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def annotate(self, **attributes):
+        """Adds attributes (e.g. the question) to the current thread's trace."""
+        trace = getattr(self.local, "trace", None)
+        if trace is not None:
+            trace["attributes"].update(attributes)
+
+    def add_metric(self, name, read_fn, help_text, kind="gauge"):
+        """Exports ``read_fn()`` as an extra Prometheus metric (e.g. a queue depth)."""
+        self.metrics[name] = (read_fn, help_text, kind)
+
+    def recent(self, limit=10):
+        """Returns the last finished traces, newest first."""
+        with self.lock:
+            return list(self.traces)[::-1][:limit]
+
+    def stage_totals(self):
+        """Returns count, total seconds, errors and token sums per stage."""
+        with self.lock:
+            return {name: dict(totals, tokens=dict(totals["tokens"])) for name, totals in self.stages.items()}
+
+    def _add_to_totals(self, name, seconds, attributes):
+        with self.lock:
+            totals = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "errors": 0, "tokens": {}})
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            totals["errors"] += "error" in attributes
+            for key, value in attributes.items():
+                if key.endswith("_tokens") and isinstance(value, (int, float)):
+                    totals["tokens"][key] = totals["tokens"].get(key, 0) + value
+
+    def _write(self, trace):
+        if not self.metrics_path:
+            return
+        try:
+            with self.lock:
+                # Keeps at most two files of max_bytes on disk
+                if self.max_bytes and os.path.exists(self.metrics_path) and os.path.getsize(self.metrics_path) >= self.max_bytes:
+                    os.replace(self.metrics_path, self.metrics_path + ".1")
+                with open(self.metrics_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+    def prometheus_text(self):
+        """Renders the per-stage totals in the Prometheus text exposition format."""
+        lines = [
+            "# HELP chatbot_stage_seconds Time spent in each stage of the chat request path.",
+            "# TYPE chatbot_stage_seconds summary",
+        ]
+        totals = self.stage_totals()
+        for name, stage in sorted(totals.items()):
+            lines.append(f'chatbot_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+            lines.append(f'chatbot_stage_seconds_sum{{stage="{name}"}} {stage["seconds"]:.6f}')
+        lines += ["# HELP chatbot_stage_errors_total Stages that raised an exception.", "# TYPE chatbot_stage_errors_total counter"]
+        for name, stage in sorted(totals.items()):
+            lines.append(f'chatbot_stage_errors_total{{stage="{name}"}} {stage["errors"]}')
+        lines += ["# HELP chatbot_tokens_total Tokens recorded by each stage.", "# TYPE chatbot_tokens_total counter"]
+        for name, stage in sorted(totals.items()):
+            for kind, count in sorted(stage["tokens"].items()):
+                lines.append(f'chatbot_tokens_total{{stage="{name}",kind="{kind[:-len("_tokens")]}"}} {count}')
+        for name, (read_fn, help_text, kind) in sorted(self.metrics.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {read_fn()}"]
+        return "\n".join(lines) + "\n"
+
+    def start_metrics_server(self, port, host="127.0.0.1"):
+        """Serves ``prometheus_text()`` at ``/metrics`` from a daemon thread."""
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"Serving metrics on http://{host}:{port}/metrics")
+        return server
@@ -0,0 +1,136 @@
+import argparse
+import sqlite3
+import threading
+
+
+# Translation backend that calls the googletrans web API
+class GoogleTransBackend:
+    """Translates with googletrans; a whole batch goes out in one call."""
+
+    def __init__(self):
+        from googletrans import Translator
+        self.translator = Translator()
+
+    def translate_batch(self, texts, src, dest):
+        return [result.text for result in self.translator.translate(list(texts), src=src, dest=dest)]
+
+
+# Offline translation backend using MarianMT models from Hugging Face
+class MarianBackend:
+    """Translates locally with Helsinki-NLP opus-mt models (downloaded once, then offline)."""
+
+    def __init__(self, model_template="Helsinki-NLP/opus-mt-{src}-{dest}"):
+        self.model_template = model_template
+        self.models = {}
+
+    def translate_batch(self, texts, src, dest):
+        from transformers import MarianMTModel, MarianTokenizer
+        import torch
+
+        name = self.model_template.format(src=src, dest=dest)
+        if name not in self.models:
+            self.models[name] = (MarianTokenizer.from_pretrained(name), MarianMTModel.from_pretrained(name).eval())
+        tokenizer, model = self.models[name]
+        inputs = tokenizer(list(texts), return_tensors="pt", padding=True, truncation=True)
+        with torch.inference_mode():
+            outputs = model.generate(**inputs)
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+# Backend that returns the text unchanged, for tests and offline runs
+class IdentityBackend:
+    def translate_batch(self, texts, src, dest):
+        return list(texts)
+
+
+TRANSLATION_BACKENDS = {
+    "googletrans": GoogleTransBackend,
+    "marian": MarianBackend,
+    "identity": IdentityBackend,
+}
+
+
+# Translation service with a persistent cache in front of a pluggable backend
+class TranslationService:
+    """Translates text through ``backend``, remembering every translation in SQLite.
+
+    ``backend`` is any object with ``translate_batch(texts, src, dest)``.
+    """
+
+    def __init__(self, backend, cache_path="translation_cache.sqlite3"):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.backend_calls = 0
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                src TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                text TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                PRIMARY KEY (src, dest, text)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def translate(self, text, src, dest):
+        """Translates one text, using the cache when possible."""
+        return self.translate_batch([text], src, dest)[0]
+
+    def translate_batch(self, texts, src, dest):
+        """Translates many texts with at most one backend call for the ones not cached yet."""
+        texts = list(texts)
+        if src == dest:
+            return texts
+        with self.lock:
+            cached = {}
+            for text in set(texts):
+                row = self.connection.execute(
+                    "SELECT translation FROM translations WHERE src = ? AND dest = ? AND text = ?",
+                    (src, dest, text),
+                ).fetchone()
+                if row is not None:
+                    cached[text] = row[0]
+
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+        if missing:
+            translations = self.backend.translate_batch(missing, src, dest)
+            self.backend_calls += 1
+            with self.lock:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)",
+                    [(src, dest, text, translation) for text, translation in zip(missing, translations)],
+                )
+                self.connection.commit()
+            cached.update(zip(missing, translations))
+        return [cached[text] for text in texts]
+
+
+# Function to precompute translations of every canned answer in a label index
+def translate_answers(label_index, service, languages=("hi",)):
+    """Adds translated answers for each language to the label index."""
+    for language in languages:
+        label_index.translations[language] = service.translate_batch(label_index.answers, "en", language)
+        print(f"Translated {len(label_index.answers)} answers to '{language}'")
+    return label_index
+
+
+def main():
+    from bert_inference import LabelIndex
+
+    parser = argparse.ArgumentParser(description="Precompute translated canned answers for a trained model.")
+    parser.add_argument("--model-dir", default="./bert_chatbot_model")
+    parser.add_argument("--languages", nargs="+", default=["hi"])
+    parser.add_argument("--backend", choices=TRANSLATION_BACKENDS, default="googletrans")
+    parser.add_argument("--cache-path", default="translation_cache.sqlite3")
+    args = parser.parse_args()
+
+    label_index = LabelIndex.load(args.model_dir)
+    service = TranslationService(TRANSLATION_BACKENDS[args.backend](), cache_path=args.cache_path)
+    translate_answers(label_index, service, args.languages).save(args.model_dir)
+
+
+if __name__ == "__main__":
+    main()